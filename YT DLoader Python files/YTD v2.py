@@ -2,44 +2,55 @@ from email import header
 import os
 import json
 import threading
+import time
 import queue
 import traceback
 import tkinter as tk
-from tkinter import filedialog, messagebox, END
+from tkinter import filedialog, messagebox
 import customtkinter as ctk
-from yt_dlp import YoutubeDL
 import ctypes
-import winsound
+import functools
 import sys
-import requests  
-import socket   
-from PIL import Image, ImageTk  
-import io  
-import shutil 
+import multiprocessing
 import webbrowser 
+from ytdloader import engine, isolated, profiling
+from ytdloader.engine import DEFAULT_OUTDIR, human_size, format_seconds
+from ytdloader.archive import DownloadArchive
+from ytdloader.bandwidth import BandwidthGovernor, parse_hours, parse_rate
+from ytdloader.cache import MetadataCache
+from ytdloader.extractpool import ExtractionPool, default_workers
+from ytdloader.fragments import FragmentTuner
+from ytdloader.frameclock import FrameClock, WakingQueue
+from ytdloader.jobs import JobQueue, DONE, CANCELLED
+from ytdloader.journal import JobJournal
+from ytdloader.metrics import MetricsRecorder
+from ytdloader.logview import LogBuffer, start_file_log
+from ytdloader.netmon import ConnectivityMonitor
+from ytdloader.progress import ProgressBoard
+from ytdloader.thumbs import ThumbnailLoader
 
 APP_TITLE = "YT DLoader - YouTube Video Downloader"
-DEFAULT_OUTDIR = os.path.join(os.path.expanduser("~"), "Downloads")
 START_SIZE = "920x520"
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("dark-blue")
 
-try:
-    hwnd = ctypes.windll.user32.GetForegroundWindow()
-    DWMWA_USE_IMMERSIVE_DARK_MODE = 20
-    DWMWA_CAPTION_COLOR = 35
-    DWMWA_TEXT_COLOR = 36
-
-    ctypes.windll.dwmapi.DwmSetWindowAttribute(hwnd, DWMWA_USE_IMMERSIVE_DARK_MODE,
-                                               ctypes.byref(ctypes.c_int(1)), ctypes.sizeof(ctypes.c_int))
-    white = ctypes.c_int(0x00FFFFFF)
-    dark = ctypes.c_int(0x00121212)
-    ctypes.windll.dwmapi.DwmSetWindowAttribute(hwnd, DWMWA_CAPTION_COLOR,
-                                               ctypes.byref(dark), ctypes.sizeof(ctypes.c_int))
-    ctypes.windll.dwmapi.DwmSetWindowAttribute(hwnd, DWMWA_TEXT_COLOR,
-                                               ctypes.byref(white), ctypes.sizeof(ctypes.c_int))
-except Exception:
-    pass
+def apply_dark_title_bar():
+    try:
+        hwnd = ctypes.windll.user32.GetForegroundWindow()
+        DWMWA_USE_IMMERSIVE_DARK_MODE = 20
+        DWMWA_CAPTION_COLOR = 35
+        DWMWA_TEXT_COLOR = 36
+
+        ctypes.windll.dwmapi.DwmSetWindowAttribute(hwnd, DWMWA_USE_IMMERSIVE_DARK_MODE,
+                                                   ctypes.byref(ctypes.c_int(1)), ctypes.sizeof(ctypes.c_int))
+        white = ctypes.c_int(0x00FFFFFF)
+        dark = ctypes.c_int(0x00121212)
+        ctypes.windll.dwmapi.DwmSetWindowAttribute(hwnd, DWMWA_CAPTION_COLOR,
+                                                   ctypes.byref(dark), ctypes.sizeof(ctypes.c_int))
+        ctypes.windll.dwmapi.DwmSetWindowAttribute(hwnd, DWMWA_TEXT_COLOR,
+                                                   ctypes.byref(white), ctypes.sizeof(ctypes.c_int))
+    except Exception:
+        pass
 
 _ffmpeg_warning_shown = False
 
@@ -47,19 +58,9 @@ def setup_ffmpeg():
     """Find FFmpeg: bundled → system PATH → show warning if missing."""
     global _ffmpeg_warning_shown
 
-    if getattr(sys, 'frozen', False):
-        app_dir = os.path.dirname(sys.executable)     
-    else:
-        app_dir = os.path.dirname(os.path.abspath(__file__)) 
-
-    bundled_path = os.path.join(app_dir, "ffmpeg", "ffmpeg.exe")
-
-    if os.path.isfile(bundled_path):
-        return bundled_path 
-
-    system_ffmpeg = shutil.which("ffmpeg")
-    if system_ffmpeg:
-        return system_ffmpeg  
+    ffmpeg = engine.find_ffmpeg()
+    if ffmpeg:
+        return ffmpeg
 
     if not _ffmpeg_warning_shown:
         messagebox.showwarning(
@@ -72,37 +73,15 @@ def setup_ffmpeg():
 
     return "ffmpeg"
 
-def human_size(num_bytes):
-    try:
-        n = float(num_bytes)
-    except Exception:
-        return "Unknown"
-    if n <= 0:
-        return "0B"
-    for unit in ["B", "KB", "MB", "GB", "TB"]:
-        if n < 1024.0:
-            return f"{n:3.1f} {unit}"
-        n /= 1024.0
-    return f"{n:.1f} PB"
-
-def format_seconds(s):
-    try:
-        s = int(float(s))
-    except Exception:
-        return None
-    h = s // 3600
-    m = (s % 3600) // 60
-    sec = s % 60
-    if h:
-        return f"{h}:{m:02d}:{sec:02d}"
-    return f"{m}:{sec:02d}"
-
 class YTDLoader(ctk.CTk):
     def __init__(self):
         super().__init__()
 
         self.config_path = "config.json"
-        self.last_folder = self._load_last_folder()
+        self.config = self._load_config()
+        self.last_folder = self.config.get("last_folder", "")
+        self.max_jobs = self._config_int("max_jobs", 4)
+        self.postprocess_jobs = self._config_int("postprocess_jobs", 2)
 
         self.title("YT DLoader")
         self.geometry("1100x650")
@@ -113,41 +92,63 @@ class YTDLoader(ctk.CTk):
         except Exception:
             pass
 
-        self.queue = queue.Queue()
+        engine.preload()
+        self.profile_dir = profiling.profile_dir()
+        self.frame_profiler = profiling.SectionProfiler("ui-frames", self.profile_dir) if self.profile_dir else None
+        self.clock = FrameClock(self, self._on_frame_profiled if self.frame_profiler else self._on_frame)
+        self.queue = WakingQueue(self.clock.wake)
         self.fetch_thread = None
-        self.download_thread = None
+        self.archive = self._open_archive()
+        self.journal, resumable = self._open_journal()
+        self.governor = self._make_governor()
+        self.fragments = self._fixed_fragments()
+        self.tuner = FragmentTuner(os.path.join(engine.app_data_dir(), "fragment_tuning.json"))
+        runner = functools.partial(isolated.download, governor=self.governor, tuner=self.tuner)
+        self.jobs = JobQueue(runner, max_workers=self.max_jobs, on_event=self._on_job_event,
+                             archive=self.archive, journal=self.journal, metrics=self._open_metrics(),
+                             postprocess_workers=self.postprocess_jobs)
+        self.log_buffer = LogBuffer(max_lines=self._config_int("log_view_lines", 1000))
+        self.log_listener = self._start_file_log()
+        self.progress_board = ProgressBoard(max_rate=self._config_int("progress_fps", 10))
         self.available_options = []
+        self.last_fetch = None
+        self._playlist_stops = []
+        self.meta_cache = self._open_metadata_cache()
+        self.extractor = self._start_extraction_pool()
+        self.thumbs = ThumbnailLoader(lambda url, img, err: self.queue.put(("thumbnail", (url, img, err))),
+                                      cache_dir=os.path.join(engine.app_data_dir(), "thumbnails"))
+        self._thumb_url = None
+        self.netmon = ConnectivityMonitor(
+            on_change=lambda online: self.queue.put(("connectivity", online))).start()
 
-        self._cancel_requested = False
         self._marquee_pos = 0.0
         self._error_shown = False
+        # Per batch of jobs (until the queue drains): finished and failed counts, and jobs
+        # waiting for the connection to come back.
+        self._done_count = 0
+        self._failed_count = 0
+        self._offline_jobs = []
+        self._close_deadline = None
 
         self.retry_count = 0
         self.max_retries = 10
 
-        self._spinner_running = False
-        self._spinner_after_id = None
         self._spinner_chars = ["⠋","⠙","⠸","⠴","⠦","⠇","⠋","⠙","⠸","⠴","⠦","⠇"]
         self._spinner_index = 0
 
-        self._dl_spinner_running = False
         self._dl_spinner_index = 0
-        self._dl_spinner_after = None
         self._dl_spinner_chars = ["⠋","⠙","⠸","⠴","⠦","⠇"]
+        self._status_text = "Idle"
 
         self._build_ui()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
         self.after(100, self._center_window)
-        self._periodic_check()
+        self.clock.start()
+        self._resume_jobs(resumable)
 
     def _check_internet(self):
-        """Check if internet is connected (ping Google)."""
-        try:
-            response = requests.get("http://www.google.com", timeout=3)
-            return response.status_code == 200
-        except (requests.RequestException, socket.timeout):
-            return False
-        except Exception:
-            return False
+        """Last known connectivity to the download host (never blocks)."""
+        return self.netmon.is_online()
 
     def _show_no_internet_popup(self):
         """Show popup and stop spinners."""
@@ -157,34 +158,147 @@ class YTDLoader(ctk.CTk):
             "No Internet Connection",
             "Please check your Internet connection. Will auto-retry when back online."
         )
-        self.status_label.configure(text="No Internet — Retrying...")
+        self._set_status("No Internet — Retrying...")
         self._append_log("No internet detected. Auto-retrying in 5 seconds...")
 
     def _start_auto_retry(self, action_func):
-        """Start timer to check internet & auto-call action_func (fetch or download)."""
-        def check_and_retry():
-            if self._check_internet():
-                self._append_log("Internet back! Resuming...")
-                action_func()  
-            else:
-                self.after(5000, check_and_retry)
-
-        check_and_retry()
+        """Auto-call action_func (fetch or download) once the monitor sees the host again."""
+        self.netmon.report_failure()
+        self.netmon.when_online(lambda: self.queue.put(("retry", action_func)), delay=5)
 
-    def _load_last_folder(self):
+    def _load_config(self):
         if os.path.exists(self.config_path):
             try:
                 with open(self.config_path, "r") as f:
                     data = json.load(f)
-                    return data.get("last_folder", "")
+                    return data if isinstance(data, dict) else {}
             except:
-                return ""
-        return ""
+                return {}
+        return {}
+
+    def _config_int(self, key, default):
+        try:
+            return max(1, int(self.config.get(key, default)))
+        except (TypeError, ValueError):
+            return default
+
+    def _start_extraction_pool(self):
+        """Extraction processes (config ``extract_workers``, 0 = extract on a thread in this process)."""
+        try:
+            workers = int(self.config.get("extract_workers", default_workers()))
+        except (TypeError, ValueError):
+            workers = default_workers()
+        if workers <= 0:
+            return None
+        pool = ExtractionPool(workers, max_tasks_per_child=self._config_int("extract_recycle_after", 25),
+                              timeout=self._config_int("extract_timeout", 120))
+        pool.warm()
+        return pool
+
+    def _open_metadata_cache(self):
+        try:
+            return MetadataCache(os.path.join(engine.app_data_dir(), "metadata.sqlite3"),
+                                 ttl=self._config_int("cache_ttl_hours", 24) * 3600,
+                                 max_entries=self._config_int("cache_max_entries", 1000))
+        except Exception:
+            return None
+
+    def _open_archive(self):
+        if not self.config.get("use_archive", True):
+            return None
+        try:
+            return DownloadArchive(os.path.join(engine.app_data_dir(), "archive.txt"))
+        except Exception:
+            return None
+
+    def _open_metrics(self):
+        """Per-job phase timings in ``metrics/`` (JSON lines and a Prometheus textfile)."""
+        if not self.config.get("metrics", True):
+            return None
+        folder = os.path.join(engine.app_data_dir(), "metrics")
+        return MetricsRecorder(os.path.join(folder, "jobs.jsonl"), os.path.join(folder, "ytdloader.prom"))
+
+    def _make_governor(self):
+        """Global bandwidth cap from config: ``bandwidth_limit`` during ``business_hours``
+        (e.g. "9-18", Monday to Friday; always when unset), ``off_hours_bandwidth_limit`` otherwise."""
+        def rate(key):
+            try:
+                return parse_rate(self.config.get(key))
+            except ValueError:
+                return None
+        try:
+            hours = parse_hours(self.config["business_hours"]) if self.config.get("business_hours") else None
+        except ValueError:
+            hours = None
+        return BandwidthGovernor(limit=rate("bandwidth_limit"),
+                                 off_hours_limit=rate("off_hours_bandwidth_limit"), business_hours=hours)
+
+    def _fixed_fragments(self):
+        """``concurrent_fragments`` from config: a number fixes it, "auto" (default) tunes it."""
+        value = self.config.get("concurrent_fragments", "auto")
+        if str(value).strip().lower() == "auto":
+            return None
+        return self._config_int("concurrent_fragments", 4)
+
+    def _limit_key(self):
+        return "bandwidth_limit" if self.governor.in_business_hours() else "off_hours_bandwidth_limit"
+
+    def _apply_speed_limit(self, event=None):
+        """Set the cap for the current period (business or off-hours) from the entry."""
+        text = self.limit_entry.get().strip()
+        try:
+            limit = parse_rate(text)
+        except ValueError:
+            self._append_log(f"Invalid speed limit: {text} (use e.g. 5M or 500K)")
+            return
+        key = self._limit_key()
+        if self.config.get(key, "") == text:
+            return
+        self.config[key] = text
+        self._save_config()
+        if key == "bandwidth_limit":
+            self.governor.set_limits(limit=limit)
+        else:
+            self.governor.set_limits(off_hours_limit=limit)
+        self._append_log(f"Speed limit: {human_size(limit) + '/s' if limit else 'unlimited'}")
+
+    def _open_journal(self):
+        """Open the job journal and return it with the jobs left unfinished last time."""
+        if not self.config.get("resume_jobs", True):
+            return None, []
+        journal = JobJournal(os.path.join(engine.app_data_dir(), "journal.jsonl"))
+        if not journal.acquire():
+            self.queue.put(("log", "Another YT DLoader is using the job journal; "
+                                   "downloads in this window will not be resumed."))
+            return None, []
+        try:
+            return journal, journal.load()
+        except Exception:
+            return journal, []
+
+    def _resume_jobs(self, entries):
+        for entry in entries:
+            partial = entry.get("partial_bytes")
+            note = f" ({human_size(partial)} already on disk)" if partial else ""
+            job = self._submit_job(entry["url"], entry["options"], f"resumed {entry['url']}{note}",
+                                   key=entry.get("key"), uid=entry["uid"])
+            if job is not None and job.uid == entry["uid"]:
+                self._start_dl_spinner()
+
+    def _start_file_log(self):
+        try:
+            return start_file_log(os.path.join(engine.app_data_dir(), "logs", "ytdloader.log"))
+        except Exception:
+            return None
 
     def _save_last_folder(self, folder):
+        self.config["last_folder"] = folder
+        self._save_config()
+
+    def _save_config(self):
         try:
             with open(self.config_path, "w") as f:
-                json.dump({"last_folder": folder}, f)
+                json.dump(self.config, f)
         except:
             pass
 
@@ -262,6 +376,11 @@ class YTDLoader(ctk.CTk):
                           command=self._paste_and_fetch)
         paste_btn.grid(row=1, column=1, padx=(6, 0))
 
+        refresh_btn = ctk.CTkButton(url_frame, text="↻", width=30,
+                                    fg_color="#2979FF", hover_color="#1565C0",
+                                    command=self._refresh_formats)
+        refresh_btn.grid(row=1, column=2, padx=(6, 0))
+
         left_row += 1
 
         self._add_divider(main_left, left_row)
@@ -311,6 +430,17 @@ class YTDLoader(ctk.CTk):
         self.fname_entry.insert(0, "%(title)s.%(ext)s")
         self.fname_entry.grid(row=1, column=0, sticky="ew", pady=(6, 0))
 
+        day = self.governor.in_business_hours()
+        limit_lbl = ctk.CTkLabel(fname_frame, text="Speed limit (day):" if day else "Speed limit (night):")
+        limit_lbl.grid(row=0, column=1, sticky="w", padx=(16, 0))
+        self.limit_entry = ctk.CTkEntry(fname_frame, width=110, placeholder_text="e.g. 5M")
+        limit = self.config.get(self._limit_key())
+        if limit:
+            self.limit_entry.insert(0, str(limit))
+        self.limit_entry.grid(row=1, column=1, sticky="w", padx=(16, 0), pady=(6, 0))
+        self.limit_entry.bind("<Return>", self._apply_speed_limit)
+        self.limit_entry.bind("<FocusOut>", self._apply_speed_limit)
+
         left_row += 1
         self._add_divider(main_left, left_row)
         left_row += 1
@@ -339,6 +469,11 @@ class YTDLoader(ctk.CTk):
         self.cancel_btn = ctk.CTkButton(btns_frame, text="Cancel", width=140, command=self._on_cancel, state="disabled",
                                         fg_color="#246BE6", hover_color="#135EB4")
         self.cancel_btn.grid(row=0, column=1)
+        # Skips the "already downloaded" archive check for the next Download click only.
+        self.redownload_var = tk.BooleanVar(value=False)
+        self.redownload_cb = ctk.CTkCheckBox(btns_frame, text="Download again", variable=self.redownload_var,
+                                             fg_color="#2979FF", hover_color="#1565C0")
+        self.redownload_cb.grid(row=0, column=2, padx=(12, 0))
 
         left_row += 1
 
@@ -348,7 +483,7 @@ class YTDLoader(ctk.CTk):
         self.progress.set(0)
         self.progress.configure(progress_color="#d61a1a", fg_color="#383838")
         left_row += 1
-        self.status_label = ctk.CTkLabel(main_left, text="Idle", anchor="w")
+        self.status_label = ctk.CTkLabel(main_left, text=self._status_text, anchor="w")
         self.status_label.grid(row=left_row, column=0, sticky="w", padx=12, pady=(0, 12))
 
         main_right.grid_rowconfigure(2, weight=1) 
@@ -419,6 +554,41 @@ class YTDLoader(ctk.CTk):
 
         self._append_log("Ready. Paste a YouTube URL or click Paste to begin.")
 
+    def _beep(self):
+        try:
+            import winsound
+            winsound.MessageBeep(winsound.MB_ICONASTERISK)
+        except Exception:
+            self.bell()
+
+    def _on_close(self):
+        if self._close_deadline is not None:
+            return
+        if self.journal is not None:
+            self.journal.close()
+        # Kill running downloads (and their ffmpeg) but keep what they fetched for the next start.
+        self.jobs.shutdown(keep_partials=True)
+        self._close_deadline = time.monotonic() + isolated.KILL_TIMEOUT
+        self.withdraw()
+        self._finish_close()
+
+    def _finish_close(self):
+        # Polled from the Tk loop rather than joined: the workers' last events wake
+        # the clock with event_generate, which blocks until this loop runs again.
+        if self.jobs.active() and time.monotonic() < self._close_deadline:
+            self.after(100, self._finish_close)
+            return
+        self.netmon.stop()
+        if self.meta_cache is not None:
+            self.meta_cache.close()
+        if self.extractor is not None:
+            self.extractor.shutdown()
+        if self.frame_profiler is not None:
+            self.frame_profiler.dump()
+        if self.log_listener:
+            self.log_listener.stop()
+        self.destroy()
+
     def _on_enter(self, event):
         """Prevent Enter from triggering a fetch automatically."""
         return "break"
@@ -434,15 +604,12 @@ class YTDLoader(ctk.CTk):
         self.geometry(f"{w}x{h}+{x}+{y}")
 
     def _append_log(self, text):
-        self.log_text.configure(state="normal")
-        self.log_text.insert(END, text + "\n")
-        self.log_text.see("end")
-        self.log_text.configure(state="disabled")
+        """Queue a log line; it is drawn with the next batch in _on_frame."""
+        self.log_buffer.append(text)
+        self.clock.wake()
 
     def _clear_log(self):
-        self.log_text.configure(state="normal")
-        self.log_text.delete("1.0", END)
-        self.log_text.configure(state="disabled")
+        self.log_buffer.clear(self.log_text)
 
     def _choose_folder(self):
         folder = filedialog.askdirectory(initialdir=self.out_dir_var.get() or os.path.expanduser("~"))
@@ -468,6 +635,11 @@ class YTDLoader(ctk.CTk):
         self.after(150, lambda: self._fetch_formats(self.url_var.get().strip()))
         return None
 
+    def _refresh_formats(self):
+        """Re-fetch formats for the current URL, bypassing the metadata cache."""
+        self._error_shown = False
+        self._fetch_formats(self.url_var.get().strip(), refresh=True)
+
     def _on_format_change(self, value):
         self._update_resolution_state()
 
@@ -475,8 +647,10 @@ class YTDLoader(ctk.CTk):
         fmt = self.format_var.get()
         if fmt == "Audio":
             try:
-                self.res_menu.configure(values=["Audio only"], state="disabled")
-                self.res_var.set("Audio only")
+                labels = [label for label, _ in engine.AUDIO_FORMATS]
+                preferred = engine.audio_codec(self.config.get("audio_format", engine.DEFAULT_AUDIO_FORMAT))
+                self.res_menu.configure(values=labels, state="normal")
+                self.res_var.set(next(label for label, codec in engine.AUDIO_FORMATS if codec == preferred))
             except Exception:
                 pass
         else:
@@ -490,77 +664,58 @@ class YTDLoader(ctk.CTk):
                 pass
 
     def _start_spinner(self):
-        if self._spinner_running:
+        if self.clock.is_animating("fetch_spinner"):
             return
-        self._spinner_running = True
         self._spinner_index = 0
-        self._spinner_step()
+        self.clock.animate("fetch_spinner", 0.08, self._spinner_step)
 
     def _spinner_step(self):
-        if not self._spinner_running:
-            return
         ch = self._spinner_chars[self._spinner_index % len(self._spinner_chars)]
         self.spinner_label.configure(text=ch)
         self._spinner_index += 1
-        self._spinner_after_id = self.after(80, self._spinner_step)
 
     def _stop_spinner(self):
-        if not self._spinner_running:
+        if not self.clock.is_animating("fetch_spinner"):
             return
-        self._spinner_running = False
-        if self._spinner_after_id:
-            try:
-                self.after_cancel(self._spinner_after_id)
-            except Exception:
-                pass
-            self._spinner_after_id = None
+        self.clock.stop("fetch_spinner")
         try:
             self.spinner_label.configure(text="")
         except Exception:
             pass
 
+    def _set_status(self, text):
+        """Set the status line; the download spinner glyph is drawn after it."""
+        self._status_text = text
+        self._draw_status()
+
+    def _draw_status(self):
+        txt = (self._status_text or "").rstrip()
+        if self.clock.is_animating("dl_spinner"):
+            spin = self._dl_spinner_chars[self._dl_spinner_index]
+            txt = f"{txt} {spin}" if txt else spin
+        self.status_label.configure(text=txt)
+
     def _start_dl_spinner(self):
-        if self._dl_spinner_running:
+        if self.clock.is_animating("dl_spinner"):
             return
-        self._dl_spinner_running = True
         self._dl_spinner_index = 0
-        self._dl_spinner_step()
+        self.clock.animate("dl_spinner", 0.09, self._dl_spinner_step)
 
     def _dl_spinner_step(self):
-        if not self._dl_spinner_running:
-            return
-        spin = self._dl_spinner_chars[self._dl_spinner_index]
         self._dl_spinner_index = (self._dl_spinner_index + 1) % len(self._dl_spinner_chars)
-
-        txt = self.status_label.cget("text")
-        if txt and txt.strip():
-            parts = txt.rsplit(" ", 1)
-            if parts[-1] in self._dl_spinner_chars:
-                txt = parts[0]
-        else:
-            txt = ""
-        txt = txt.rstrip()
-        if txt:
-            self.status_label.configure(text=f"{txt} {spin}")
-        else:
-            self.status_label.configure(text=f"{spin}")
-        self._dl_spinner_after = self.after(90, self._dl_spinner_step)
+        self._draw_status()
 
     def _stop_dl_spinner(self):
-        self._dl_spinner_running = False
-        if self._dl_spinner_after:
-            try:
-                self.after_cancel(self._dl_spinner_after)
-            except:
-                pass
-        self._dl_spinner_after = None
+        self.clock.stop("dl_spinner")
+        self._draw_status()
 
-    def _fetch_formats(self, url):
+    def _fetch_formats(self, url, refresh=False):
         if not url:
             return
+        self.netmon.set_target(url)
         if not self._check_internet():
             self._show_no_internet_popup()
-            self._start_auto_retry(lambda: self._fetch_formats(url))
+            self._start_auto_retry(lambda: self._fetch_formats(url, refresh))
             return 
         if self.fetch_thread and self.fetch_thread.is_alive():
             self._append_log("Already fetching formats...")
@@ -570,58 +725,31 @@ class YTDLoader(ctk.CTk):
             self.res_var.set("Fetching...")
         except Exception:
             pass
-        self._append_log("Fetching formats and size estimates...")
+        self._append_log("Refreshing formats..." if refresh else "Fetching formats and size estimates...")
         self._error_shown = False
         self._start_spinner()
-        self.fetch_thread = threading.Thread(target=self._fetch_worker, args=(url,), daemon=True)
+        self.fetch_thread = threading.Thread(target=self._profiled,
+                                             args=("fetch", self._fetch_worker, url, refresh), daemon=True)
         self.fetch_thread.start()
 
-    def _fetch_worker(self, url):
+    def _fetch_worker(self, url, refresh=False):
         try:
-            ydl_opts = {"quiet": True, "no_warnings": True}
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-            formats = info.get("formats", []) or []
-            heights = {}
-            best_audio = None
-            for f in formats:
-                if (not f.get("vcodec") or f.get("vcodec") == "none") and f.get("acodec") and f.get("acodec") != "none":
-                    if best_audio is None or (f.get("abr") or 0) > (best_audio.get("abr") or 0):
-                        best_audio = f
-                if f.get("vcodec") and f.get("vcodec") != "none":
-                    h = f.get("height")
-                    if h:
-                        current = heights.get(h)
-                        score = (f.get("tbr") or 0) + (f.get("width") or 0)/1000.0
-                        if current is None or score > current[0]:
-                            heights[h] = (score, f)
-            heights_list = sorted([h for h in heights.keys() if isinstance(h, int)], reverse=True)
-
-            options = [("Auto (recommended)", None, None)]
-            for h in heights_list:
-                entry = heights[h][1]
-                vsize = entry.get("filesize") or entry.get("filesize_approx") or 0
-                a_size = best_audio.get("filesize") or best_audio.get("filesize_approx") or 0 if best_audio else 0
-                total = None
-                if vsize or a_size:
-                    total = (vsize or 0) + (a_size or 0)
-                label = f"{h}p"
-                label_full = label
-                options.append((label_full, h, total))
-
+            if engine.is_playlist_url(url):
+                self._fetch_playlist_summary(url)
+                return
+            result = engine.fetch(url, cache=self.meta_cache, refresh=refresh,
+                                  extractor=self.extractor.extract if self.extractor else None)
+            options = result["options"]
             self.available_options = options
+            self.last_fetch = result
             labels = [o[0] for o in options]
 
-            video_info = {
-                "title": info.get("title", "Unknown"),
-                "duration": info.get("duration"),
-                "uploader": info.get("uploader", "Unknown"),
-                "thumbnail": info.get("thumbnail")
-            }
+            video_info = result["video"]
             self.queue.put(("video_info", video_info))
 
             self.queue.put(("formats_ready", labels))
-            self.queue.put(("log", f"Formats fetched: {', '.join(labels[:6])}"))
+            source = " (cached)" if result["cached"] else ""
+            self.queue.put(("log", f"Formats fetched{source}: {', '.join(labels[:6])}"))
         except Exception as e:
             err_msg = str(e).lower()
             if not self._check_internet() or any(x in err_msg for x in ["connection", "timeout", "network"]):
@@ -634,12 +762,28 @@ class YTDLoader(ctk.CTk):
             except Exception:
                 pass
 
+    def _fetch_playlist_summary(self, url):
+        """Show a playlist's title without resolving any of its entries."""
+        summary, entries = engine.open_playlist(url)
+        entries.close()
+        options = engine.playlist_format_options()
+        self.available_options = options
+        self.last_fetch = {"key": engine.canonical_key(url), "info": None, "options": options,
+                           "video": summary, "cached": False, "playlist": True}
+        count = f" ({summary['count']} videos)" if summary.get("count") else ""
+        self.queue.put(("video_info", {"title": f"Playlist: {summary['title']}{count}",
+                                       "duration": None, "uploader": summary["uploader"],
+                                       "thumbnail": summary["thumbnail"]}))
+        self.queue.put(("formats_ready", [o[0] for o in options]))
+        self.queue.put(("log", f"Playlist detected{count}. Entries are queued as they are listed."))
+
     def _on_download(self):
         url = self.url_var.get().strip()
         if not url:
             messagebox.showwarning("No URL", "Please paste a YouTube URL first.")
             return
 
+        self.netmon.set_target(url)
         if not self._check_internet():
             self._show_no_internet_popup()
             self._start_auto_retry(self._on_download)  
@@ -654,125 +798,212 @@ class YTDLoader(ctk.CTk):
         fmt_mode = self.format_var.get()
         selected_res = self.res_var.get()
 
-        if fmt_mode == "Audio":
-            fmt = "bestaudio/best"
-        else:
-            if not selected_res or selected_res == "Auto (recommended)" or selected_res == "Fetching...":
-                fmt = "bestvideo+bestaudio/best"
-            else:
-                try:
-                    h_part = selected_res.split("p")[0]
-                    h = int(h_part.strip())
-                    fmt = f"bestvideo[height<={h}]+bestaudio/best"
-                except Exception:
-                    fmt = "bestvideo+bestaudio/best"
-
-        out_template = os.path.join(outdir, "%(title)s.%(ext)s")
-        ydl_opts = {
-            "format": fmt,
-            "outtmpl": out_template,
-            "merge_output_format": "mp4",
-            "progress_hooks": [self._progress_hook],
-            "noplaylist": False,
-            "quiet": True,
-            "no_warnings": True,
-            "retries": 5,  
-            "fragment_retries": 10, 
-            "sleep_interval": 1,    
-            "max_sleep_interval": 5,
-            "ffmpeg_location": setup_ffmpeg(),
-        }
-        if fmt_mode == "Audio":
-            ydl_opts.update({
-                "postprocessors": [{
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                    "preferredquality": "192",
-                }],
-            })
+        fetched = self.last_fetch
+        if fetched and fetched["key"] != engine.canonical_key(url):
+            fetched = None
+        # In audio mode the menu holds an AUDIO_FORMATS label instead of a resolution.
+        ydl_opts = engine.build_download_options(outdir, fmt_mode, selected_res,
+                                                 ffmpeg_location=setup_ffmpeg(),
+                                                 options=fetched and fetched["options"],
+                                                 fragments=self.fragments, audio_format=selected_res,
+                                                 direct_merge=self.config.get("direct_merge", False),
+                                                 container=self.config.get("container", engine.DEFAULT_CONTAINER))
+        fmt = ydl_opts["format"]
+        key_for = functools.partial(engine.job_key, mode=fmt_mode, resolution=selected_res,
+                                    audio_format=selected_res, outdir=outdir,
+                                    container=self.config.get("container", engine.DEFAULT_CONTAINER))
+        skip_archive = self.redownload_var.get()
+        self.redownload_var.set(False)
 
         self.retry_count = 0
+        if engine.is_playlist_url(url):
+            self._start_playlist(url, ydl_opts, key_for, skip_archive)
+            return
+        self._submit_job(url, ydl_opts, f"format_mode={fmt_mode}, fmt={fmt}",
+                         info=fetched and fetched["info"], key=key_for(url), skip_archive=skip_archive)
 
-        self._cancel_requested = False
-        self.download_btn.configure(state="disabled")
+    def _start_playlist(self, url, ydl_opts, key_for, skip_archive=False):
+        stop = threading.Event()
+        self._playlist_stops.append(stop)
         self.cancel_btn.configure(state="normal")
-        self._append_log(f"Starting download: format_mode={fmt_mode}, fmt={fmt}")
-        self.progress.set(0.0)
-        self._marquee_pos = 0.0
-        self.status_label.configure(text="Starting download...")
-
-        self.download_thread = threading.Thread(target=self._download_worker, args=(url, ydl_opts), daemon=True)
-        self.download_thread.start()
-
-    def _download_worker(self, url, ydl_opts):
+        self._append_log("Listing playlist...")
+        ydl_opts = dict(ydl_opts, noplaylist=True)
+        threading.Thread(target=self._profiled,
+                         args=("playlist", self._playlist_worker, url, ydl_opts, key_for, skip_archive, stop),
+                         daemon=True).start()
+
+    def _playlist_worker(self, url, ydl_opts, key_for, skip_archive, stop):
+        """Stream playlist entries into the job queue while yt-dlp is still paging."""
+        count = 0
         try:
-            with YoutubeDL(ydl_opts) as ydl:
-                self._current_ydl = ydl
-                info = ydl.extract_info(url, download=True)
-                final = ydl.prepare_filename(info)
-                self.queue.put(("done", final))
+            _, entries = engine.open_playlist(url)
+            try:
+                for entry in entries:
+                    if stop.is_set():
+                        break
+                    count += 1
+                    self.queue.put(("playlist_entry", (entry, ydl_opts, key_for(entry["url"]), skip_archive)))
+            finally:
+                entries.close()
+            note = "stopped" if stop.is_set() else "finished"
+            self.queue.put(("log", f"Playlist listing {note}: {count} entries queued."))
         except Exception as e:
-            if getattr(self, "_cancel_requested", False):
-                self.queue.put(("error", {"type": "cancelled"}))
-                return
-
-            err_msg = str(e).lower()
-            if not self._check_internet() or any(x in err_msg for x in ["ssl", "decryption", "timeout", "connection", "network", "http"]):
-                self.queue.put(("no_internet_download", None))
-            else:
-                self.queue.put(("error", {"type": "download_failed", "msg": str(e)}))
-
+            self.queue.put(("log", f"Playlist listing failed after {count} entries: {e}"))
         finally:
-            try:
-                delattr(self, "_current_ydl")
-            except Exception:
-                pass
+            self.queue.put(("playlist_done", stop))
+
+    def _submit_job(self, url, ydl_opts, description="", info=None, key=None, uid=None, skip_archive=False):
+        if key and not skip_archive and self.archive is not None and key in self.archive:
+            self._append_log(f"Already downloaded, skipped: {description or url}")
+            return None
+        running = self.jobs.find(key) if key else None
+        if running is not None:
+            self._append_log(f"Already in progress as job #{running.id}: {description or url}")
+            return running
+        job = self.jobs.submit(url, ydl_opts, info, key, uid)
+        self.cancel_btn.configure(state="normal")
+        self._append_log(f"Queued job #{job.id}: {description or url}")
+        if len(self.jobs.active()) == 1:
+            self.progress.set(0.0)
+            self._marquee_pos = 0.0
+            self._set_status("Starting download...")
+        return job
+
+    def _retry_job(self, job):
+        self._start_dl_spinner()
+        self._submit_job(job.url, job.options, f"retry of job #{job.id}", key=job.key)
+
+    def _retry_offline_jobs(self):
+        jobs, self._offline_jobs = self._offline_jobs, []
+        for job in jobs:
+            self._retry_job(job)
+
+    def _batch_status(self):
+        if self._failed_count:
+            return f"Finished — {self._failed_count} job(s) failed, see log"
+        return "✅ Download Completed! "
+
+    def _on_job_event(self, kind, job, payload):
+        """Called from job worker threads; forwards events to the UI queue."""
+        if kind == "started":
+            self.queue.put(("log", f"Job #{job.id} started."))
+        elif kind == "handoff":
+            self.progress_board.discard(job.id)
+            self.queue.put(("log", f"Job #{job.id} downloaded; queued for post-processing."))
+        elif kind == "progress":
+            if self.progress_board.update(job.id, payload):
+                self.clock.wake()
+        elif kind == "log":
+            self.queue.put((kind, payload))
+        elif kind == "finished":
+            self.progress_board.discard(job.id)
+            if payload == DONE:
+                self.queue.put(("done", job))
+            elif payload == CANCELLED:
+                self.queue.put(("error", {"type": "cancelled", "job": job}))
+            else:
+                if not self._check_internet() or engine.is_network_error(job.error):
+                    self.queue.put(("no_internet_download", job))
+                else:
+                    self.queue.put(("error", {"type": "download_failed", "msg": str(job.error), "job": job}))
 
     def _on_cancel(self):
-        if self.download_thread and self.download_thread.is_alive():
-            self._append_log("Cancel requested...")
-            self._cancel_requested = True
+        for stop in self._playlist_stops:
+            stop.set()
+        cancelled = self.jobs.cancel()
+        if cancelled:
+            self._append_log(f"Cancel requested for {len(cancelled)} job(s)...")
             self.cancel_btn.configure(state="disabled")
         else:
             self._append_log("No active download to cancel.")
 
-    def _progress_hook(self, d):
-        try:
-            if getattr(self, "_cancel_requested", False):
-                raise Exception("User requested cancel")
-
-            st = d.get("status")
-            if st == "downloading":
-                total = d.get("total_bytes") or d.get("total_bytes_estimate") or 0
-                downloaded = d.get("downloaded_bytes") or 0
-                if not downloaded:
-                    downloaded = d.get("bytes_downloaded") or 0
-
-                pct = None
-                if total and total > 0:
-                    try:
-                        pct = float(downloaded) / float(total)
-                        pct = max(0.0, min(1.0, pct))
-                    except:
-                        pct = None
-                sp = d.get("speed") or d.get("download_speed") or None
-                eta = d.get("eta") or d.get("estimated_time") or None
-                self.queue.put(("progress", {"pct": pct, "eta": eta, "speed": sp, "downloaded": downloaded, "total": total}))
-
-            elif st == "finished":
-                self.queue.put(("log", "Finished downloading — post-processing..."))
-
-            elif st == "error":
-                if not self._check_internet():
-                    self.queue.put(("no_internet_download", None))  
+    def _overall_progress(self):
+        """Combine the progress of all running jobs into one snapshot."""
+        running = self.jobs.running()
+        downloaded = sum(j.progress.get("downloaded") or 0 for j in running)
+        total = sum(j.progress.get("total") or 0 for j in running)
+        speed = sum(j.progress.get("speed") or 0 for j in running)
+        etas = [j.progress.get("eta") for j in running if j.progress.get("eta")]
+        pct = None
+        if running and all(j.progress.get("pct") is not None for j in running) and total:
+            pct = max(0.0, min(1.0, float(downloaded) / float(total)))
+        return {"pct": pct, "speed": speed or None, "eta": max(etas) if etas else None,
+                "downloaded": downloaded, "total": total,
+                "running": len(running), "queued": len(self.jobs.pending()),
+                "postprocessing": len(self.jobs.postprocessing())}
+
+    def _render_progress(self):
+        """Draw the combined progress of all running jobs (called at a capped rate)."""
+        overall = self._overall_progress()
+        pct = overall.get("pct", None)
+        sp = overall.get("speed")
+        eta = overall.get("eta")
+        downloaded = overall.get("downloaded", 0)
+        jobs_note = ""
+        if overall["running"] > 1 or overall["queued"] or overall["postprocessing"]:
+            jobs_note = f" — Jobs: {overall['running']} running, {overall['queued']} queued"
+            if overall["postprocessing"]:
+                jobs_note += f", {overall['postprocessing']} post-processing"
+
+        if pct is None:
+            self._marquee_pos = (self._marquee_pos + 0.03) % 1.0
+            try:
+                self.progress.set(self._marquee_pos)
+            except Exception:
+                pass
+            status = f"Downloading — {human_size(downloaded)}"
+            if sp:
+                status += f" — {human_size(sp)}/s"
+            status += jobs_note
+            self._set_status(status)
+        else:
+            try:
+                self.progress.set(max(0.0, min(1.0, pct)))
+            except Exception:
+                pass
+            status = f"Downloading... {pct*100:5.1f}%"
+            if sp:
+                status += f" — Speed: {human_size(sp)}/s"
+
+            if eta:
+                nice_eta = format_seconds(eta)
+                if nice_eta:
+                    status += f" — Time: {nice_eta}"
                 else:
-                    self.queue.put(("log", "Network retrying chunk..."))
-                return  
+                    status += f" — Time: {eta}s"
+            else:
+                status += " — Time: --"
+            status += jobs_note
+
+            self._set_status(status)
+
+    def _on_jobs_idle(self):
+        if self._done_count:
+            self._beep()  # once per batch, not once per job
+        self._done_count = 0
+        self._failed_count = 0
+        stats = self.progress_board.stats()
+        if stats["received"]:
+            self._append_log(f"Progress updates: {stats['received']} received, {stats['delivered']} drawn "
+                             f"({stats['coalesced']} coalesced, {stats['dropped']} dropped).")
+        self._stop_dl_spinner()
+        self.cancel_btn.configure(state="disabled")
+        self.retry_count = 0
 
-        except Exception:
-            raise  
+    def _profiled(self, name, func, *args):
+        """Run a worker under cProfile and tracemalloc when profiling is on."""
+        with profiling.profiled(name, self.profile_dir):
+            return func(*args)
+
+    def _on_frame_profiled(self):
+        with self.frame_profiler:
+            return self._on_frame()
 
-    def _periodic_check(self):
+    def _on_frame(self):
+        """Frame-clock callback: drain worker events, draw progress and log lines.
+
+        Returns seconds until another frame is needed, or None when idle.
+        """
         try:
             while True:
                 item = self.queue.get_nowait()
@@ -806,121 +1037,123 @@ class YTDLoader(ctk.CTk):
                         self.duration_label.configure(text="Duration: Unknown")
                     self.uploader_label.configure(text=f"By: {uploader}")
 
+                    self._thumb_url = thumb_url
                     if thumb_url:
-                        try:
-                            response = requests.get(thumb_url, timeout=5)
-                            img_data = io.BytesIO(response.content)
-                            img = Image.open(img_data).resize((240, 135), Image.Resampling.LANCZOS)
-                            photo = ImageTk.PhotoImage(img)
-                            self.thumb_label.configure(image=photo, text="")
-                            self.thumb_label.image = photo  
-                        except Exception as e:
-                            self._append_log(f"Failed to load thumbnail: {e}")
-                            self.thumb_label.configure(text="Thumbnail failed to load")
+                        self.thumbs.request(thumb_url)
+
+                elif kind == "thumbnail":
+                    thumb_url, img, err = payload
+                    if thumb_url != self._thumb_url:
+                        continue
+                    if img is not None:
+                        from PIL import ImageTk
+                        photo = ImageTk.PhotoImage(img)
+                        self.thumb_label.configure(image=photo, text="")
+                        self.thumb_label.image = photo  
+                    else:
+                        self._append_log(f"Failed to load thumbnail: {err}")
+                        self.thumb_label.configure(text="Thumbnail failed to load")
 
                 elif kind == "log":
                     self._append_log(payload)
 
-                elif kind == "progress":
-                    pct = payload.get("pct", None)
-                    sp = payload.get("speed")
-                    eta = payload.get("eta")
-                    downloaded = payload.get("downloaded", 0)
-                    total = payload.get("total", 0)
-
-                    if pct is None:
-                        self._marquee_pos = (self._marquee_pos + 0.03) % 1.0
-                        try:
-                            self.progress.set(self._marquee_pos)
-                        except Exception:
-                            pass
-                        status = f"Downloading — {human_size(downloaded)}"
-                        if sp:
-                            status += f" — {human_size(sp)}/s"
-                        self.status_label.configure(text=status)
-                    else:
+                elif kind == "done":
+                    job = payload
+                    self._append_log(f"Job #{job.id} saved: {job.result}")
+                    self._spinner_index = 0
+                    self._done_count += 1
+                    if not self.jobs.active():
+                        self._set_status(self._batch_status())
                         try:
-                            self.progress.set(max(0.0, min(1.0, pct)))
+                            self.progress.set(1.0)
                         except Exception:
                             pass
-                        status = f"Downloading... {pct*100:5.1f}%"
-                        if sp:
-                            status += f" — Speed: {human_size(sp)}/s"
-
-                        if eta:
-                            nice_eta = format_seconds(eta)
-                            if nice_eta:
-                                status += f" — Time: {nice_eta}"
-                            else:
-                                status += f" — Time: {eta}s"
-                        else:
-                            status += f" — Time: --"
-
-                        self.status_label.configure(text=status)
-
-                elif kind == "done":
-                    self._append_log(f"Saved: {payload}")
-                    self._spinner_index = 0
-                    winsound.MessageBeep(winsound.MB_ICONASTERISK)
-                    self.status_label.configure(text="✅ Download Completed! ")
-                    try:
-                        self.progress.set(1.0)
-                    except Exception:
-                        pass
-                    self._stop_dl_spinner()
-                    self.download_btn.configure(state="normal")
-                    self.cancel_btn.configure(state="disabled")
-                    self._cancel_requested = False
+                        self._on_jobs_idle()
 
                 elif kind == "error":
-                    self._stop_dl_spinner()
                     err = payload if isinstance(payload, dict) else {"type": "invalid_url"}
                     etype = err.get("type")
+                    job = err.get("job")
 
                     if etype == "cancelled":
-                        self._append_log("Download cancelled by user.")
-                        self.status_label.configure(text="Cancelled")
+                        self._append_log(f"Job #{job.id} cancelled by user." if job else "Download cancelled by user.")
+                        self._set_status("Cancelled")
                     elif etype == "invalid_url":
                         if not self._error_shown:
                             self._error_shown = True
                             messagebox.showerror("Invalid URL", "Please enter a valid YouTube URL.")
-                        self.status_label.configure(text="Invalid URL")
+                        self._set_status("Invalid URL")
                     elif etype == "no_internet":
                         self._append_log("Too many connection failures.")
-                        self.status_label.configure(text="No Internet")
+                        self._set_status("No Internet")
                         messagebox.showwarning(
                             "No Internet Connection",
                             "Please check your Internet connection and try again."
                         )
                     else:
                         msg = err.get("msg", "Download failed")
-                        self._append_log(f"Download failed: {msg}")
-                        self.status_label.configure(text="Failed")
+                        self._append_log(f"Job #{job.id} failed: {msg}" if job else f"Download failed: {msg}")
+                        self._failed_count += 1
+                        self._set_status(f"Failed: {self._failed_count} job(s), see log")
+
+                    if not self.jobs.active():
+                        self.progress.set(0)
+                        self._on_jobs_idle()
+
+                elif kind == "playlist_entry":
+                    entry, ydl_opts, key, skip_archive = payload
+                    self._submit_job(entry["url"], ydl_opts, f"[{entry['index']}] {entry['title']}", key=key,
+                                     skip_archive=skip_archive)
 
-                    self.download_btn.configure(state="normal")
-                    self.cancel_btn.configure(state="disabled")
-                    self._cancel_requested = False
-                    self.progress.set(0)
-                    self.retry_count = 0  
+                elif kind == "playlist_done":
+                    if payload in self._playlist_stops:
+                        self._playlist_stops.remove(payload)
+                    if not self.jobs.active() and not self._playlist_stops:
+                        self._on_jobs_idle()
 
-                    self._stop_dl_spinner()
-                    self.download_btn.configure(state="normal")
-                    self.cancel_btn.configure(state="disabled")
-                    self._cancel_requested = False
+                elif kind == "retry":
+                    self._append_log("Internet back! Resuming...")
+                    payload()
+
+                elif kind == "connectivity":
+                    self._append_log("Connection restored." if payload else "Connection lost.")
 
                 elif kind == "no_internet_fetch":
                     self._show_no_internet_popup()
                     self._start_auto_retry(lambda: self._fetch_formats(self.url_var.get().strip()))
 
                 elif kind == "no_internet_download":
-                    self._show_no_internet_popup()
-                    self._start_auto_retry(self._on_download)
+                    # One status entry and one retry for every job the outage stops, not a popup each.
+                    job = payload
+                    self._offline_jobs.append(job)
+                    self._append_log(f"Job #{job.id} lost the connection; it will be retried when back online.")
+                    self._set_status(f"No Internet — {len(self._offline_jobs)} job(s) will retry when back online")
+                    if len(self._offline_jobs) == 1:
+                        self._start_auto_retry(self._retry_offline_jobs)
+                    if not self.jobs.active():
+                        self._stop_dl_spinner()
 
         except queue.Empty:
             pass
-        self.after(150, self._periodic_check)
+        if self.progress_board.drain():
+            self._render_progress()
+        self.log_buffer.flush(self.log_text)
+
+        if self.progress_board:
+            return self.progress_board.due()
+        if self.jobs.active() or self._playlist_stops or (self.fetch_thread and self.fetch_thread.is_alive()):
+            # Safety net in case a cross-thread wake-up is lost.
+            return 1.0
+        return None
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    if "--profile" in sys.argv[1:]:
+        # Same as YTDLOADER_PROFILE; an optional folder may follow the flag.
+        i = sys.argv.index("--profile")
+        folder = sys.argv[i + 1] if i + 1 < len(sys.argv) else os.path.join(engine.app_data_dir(), "profiles")
+        profiling.enable(folder)
+    apply_dark_title_bar()
     app = YTDLoader()
 
     app.mainloop()
@@ -0,0 +1,140 @@
+"""Cancel-latency benchmark for download jobs.
+
+Serves a video from a local HTTP server that stalls after the first chunk
+(or before answering at all, with ``--stall-at extract``), starts a job on
+it through ``JobQueue`` exactly as the app does, cancels it once it is
+stuck and measures:
+
+* ``cancel_s``  — from ``JobQueue.cancel`` until the job is finished
+* ``leftovers`` — partial files still in the output folder afterwards
+
+Usage::
+
+    python benchmarks/cancel_latency.py --runs 3
+    python benchmarks/cancel_latency.py --stall-at extract --budget 2.0
+
+With ``--budget`` the script exits with status 1 when any run is slower
+than the budget or leaves partial files behind, so it can gate CI.
+"""
+import argparse
+import http.server
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from ytdloader import engine, isolated  # noqa: E402
+from ytdloader.jobs import JobQueue, CANCELLED  # noqa: E402
+
+FILE_SIZE = 50 * 1024 * 1024
+FIRST_CHUNK = 256 * 1024
+
+
+class _StallingHandler(http.server.BaseHTTPRequestHandler):
+    stall_at = "download"
+    release = threading.Event()
+
+    def do_HEAD(self):
+        self._headers()
+
+    def do_GET(self):
+        if self.stall_at == "extract":
+            self.release.wait()
+            return
+        self._headers()
+        try:
+            self.wfile.write(b"\0" * FIRST_CHUNK)
+            self.wfile.flush()
+        except OSError:
+            return
+        self.release.wait()
+
+    def _headers(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(FILE_SIZE))
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _sample(url, outdir, stall_at, settle):
+    opts = engine.build_download_options(outdir, "Video", template="%(title)s.%(ext)s")
+    opts["noprogress"] = True
+    stuck = threading.Event()
+
+    def on_event(kind, job, payload):
+        if kind == "progress" and (payload.get("downloaded") or 0) >= FIRST_CHUNK // 2:
+            stuck.set()
+
+    jobs = JobQueue(isolated.download, max_workers=1, on_event=on_event)
+    job = jobs.submit(url, opts)
+    if stall_at == "download":
+        if not stuck.wait(60):
+            raise RuntimeError(f"download never started: {job.state} {job.error}")
+    time.sleep(settle)
+    start = time.perf_counter()
+    jobs.cancel(job.id)
+    job.wait(60)
+    cancel_s = time.perf_counter() - start
+    jobs.shutdown(cancel=False)
+    return {"cancel_s": cancel_s, "state": job.state, "leftovers": sorted(os.listdir(outdir))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--stall-at", choices=("download", "extract"), default="download")
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds to stay stuck before cancelling")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--budget", type=float, help="max seconds from cancel to finished")
+    args = parser.parse_args(argv)
+
+    _StallingHandler.stall_at = args.stall_at
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StallingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/stall.mp4"
+
+    samples = []
+    try:
+        for _ in range(args.runs):
+            outdir = tempfile.mkdtemp(prefix="ytd-cancel-")
+            try:
+                samples.append(_sample(url, outdir, args.stall_at, args.settle))
+            finally:
+                shutil.rmtree(outdir, ignore_errors=True)
+    finally:
+        _StallingHandler.release.set()
+        server.shutdown()
+
+    latencies = [s["cancel_s"] for s in samples]
+    print(f"cancel_s   median {statistics.median(latencies) * 1000:8.1f} ms"
+          f"   (min {min(latencies) * 1000:.1f}, max {max(latencies) * 1000:.1f})")
+    for s in samples:
+        if s["state"] != CANCELLED or s["leftovers"]:
+            print(f"run ended {s['state']} with leftovers {s['leftovers']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"stall_at": args.stall_at, "runs": args.runs, "samples": samples}, f, indent=2)
+
+    status = 0
+    if args.budget is not None:
+        for s in samples:
+            if s["cancel_s"] > args.budget or s["state"] != CANCELLED or s["leftovers"]:
+                status = 1
+        if status:
+            print(f"cancel budget {args.budget:.3f}s not met")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""Local stand-in for a video site, for benchmarks that must not touch the network.
+
+``MediaServer`` serves, for any video id:
+
+* ``/watch/<id>``                  — a page URL the ``ytdbench`` extractor plugin accepts
+* ``/api/video/<id>``              — the info JSON the extractor turns into a ``formats`` list
+* ``/media/<id>/<format>.<ext>``   — progressive files (Range requests supported)
+* ``/hls/<id>/index.m3u8``, ``/hls/<id>/seg<N>.ts`` — a fragmented format
+
+Every request can be delayed (``latency``), every media response throttled
+per connection (``bandwidth`` bytes/s) and a share of media requests
+answered with ``error_status`` instead (``error_rate``), to exercise retries.
+With ffmpeg available (``real_media``), the files are real H.264/AAC so the
+merge step can be measured; otherwise they are deterministic random bytes.
+"""
+import http.server
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plugins")
+
+_BLOCK = random.Random(0).randbytes(1 << 20) * 2
+_MEDIA = re.compile(r"^/media/(?P<id>[\w-]+)/(?P<fmt>\w+)\.(?P<ext>\w+)$")
+_HLS = re.compile(r"^/hls/(?P<id>[\w-]+)/(?:index\.m3u8|seg(?P<seg>\d+)\.ts)$")
+_RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+def use_stub_extractor():
+    """Make yt-dlp (here and in spawned download processes) load the ``ytdbench`` plugin."""
+    import sys
+    if PLUGIN_DIR not in sys.path:
+        sys.path.insert(0, PLUGIN_DIR)
+
+
+class MediaServer:
+    def __init__(self, video_size=8 << 20, audio_size=1 << 20, progressive_size=6 << 20,
+                 segments=20, segment_size=256 << 10, latency=0.0, bandwidth=None,
+                 error_rate=0.0, error_status=503, real_media=False, seed=0):
+        self.video_size = video_size
+        self.audio_size = audio_size
+        self.progressive_size = progressive_size
+        self.segments = segments
+        self.segment_size = segment_size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.real_media = real_media and bool(shutil.which("ffmpeg"))
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._tmpdir = None
+        self.stats = {"requests": 0, "errors_injected": 0, "bytes_sent": 0}
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def watch_url(self, video_id="bench"):
+        return f"{self.base_url}/watch/{video_id}"
+
+    def config(self):
+        return {"video_size": self.video_size, "audio_size": self.audio_size,
+                "progressive_size": self.progressive_size, "segments": self.segments,
+                "segment_size": self.segment_size, "latency": self.latency,
+                "bandwidth": self.bandwidth, "error_rate": self.error_rate,
+                "error_status": self.error_status, "real_media": self.real_media}
+
+    def start(self):
+        if self.real_media:
+            self._make_real_media()
+        owner = self
+
+        class Handler(_Handler):
+            server_owner = owner
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="bench-media").start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._tmpdir:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def info(self, video_id):
+        base = self.base_url
+        formats = [
+            {"format_id": "a128", "url": f"{base}/media/{video_id}/a128.m4a", "ext": "m4a",
+             "vcodec": "none", "acodec": "mp4a.40.2", "abr": 128, "filesize": self._size("a128")},
+            {"format_id": "p360", "url": f"{base}/media/{video_id}/p360.mp4", "ext": "mp4",
+             "vcodec": "avc1.42001E", "acodec": "mp4a.40.2", "width": 640, "height": 360,
+             "filesize": self._size("p360")},
+            {"format_id": "hls480", "url": f"{base}/hls/{video_id}/index.m3u8", "ext": "mp4",
+             "protocol": "m3u8_native", "vcodec": "avc1.4D401E", "acodec": "mp4a.40.2",
+             "width": 854, "height": 480},
+            {"format_id": "v720", "url": f"{base}/media/{video_id}/v720.mp4", "ext": "mp4",
+             "vcodec": "avc1.64001F", "acodec": "none", "width": 1280, "height": 720,
+             "filesize": self._size("v720")},
+        ]
+        return {"id": video_id, "title": f"Benchmark {video_id}", "duration": 60,
+                "uploader": "ytdbench", "formats": formats}
+
+    def _size(self, fmt):
+        if fmt in self._files:
+            return os.path.getsize(self._files[fmt])
+        return {"a128": self.audio_size, "p360": self.progressive_size, "v720": self.video_size}.get(fmt, 0)
+
+    def _make_real_media(self):
+        self._tmpdir = tempfile.mkdtemp(prefix="ytd-bench-media-")
+        src = ["-f", "lavfi", "-i", "testsrc2=duration=60:size={}:rate=30"]
+        sine = ["-f", "lavfi", "-i", "sine=duration=60:frequency=440"]
+        jobs = {
+            "v720": src[:3] + [src[3].format("1280x720")] + ["-c:v", "libx264", "-preset", "ultrafast", "-an"],
+            "a128": sine + ["-c:a", "aac", "-b:a", "128k", "-vn"],
+            "p360": src[:3] + [src[3].format("640x360")] + sine + ["-c:v", "libx264", "-preset", "ultrafast",
+                                                                  "-c:a", "aac", "-shortest"],
+        }
+        for fmt, args in jobs.items():
+            path = os.path.join(self._tmpdir, fmt + (".m4a" if fmt == "a128" else ".mp4"))
+            subprocess.run(["ffmpeg", "-loglevel", "error", "-y"] + args + [path], check=True)
+            self._files[fmt] = path
+
+    def _inject_error(self):
+        with self._lock:
+            return self.error_rate and self._random.random() < self.error_rate
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    server_owner = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        owner = self.server_owner
+        with owner._lock:
+            owner.stats["requests"] += 1
+        if owner.latency:
+            time.sleep(owner.latency)
+        path = self.path.split("?", 1)[0]
+        if path.startswith("/watch/"):
+            return self._send(200, "text/html", b"<html><body>ytdbench</body></html>")
+        if path.startswith("/api/video/"):
+            info = owner.info(path.rsplit("/", 1)[1])
+            return self._send(200, "application/json", json.dumps(info).encode())
+        m = _HLS.match(path)
+        if m and m.group("seg") is None:
+            lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:3", "#EXT-X-MEDIA-SEQUENCE:0"]
+            for i in range(owner.segments):
+                lines += ["#EXTINF:3.0,", f"seg{i}.ts"]
+            lines.append("#EXT-X-ENDLIST")
+            return self._send(200, "application/vnd.apple.mpegurl", ("\n".join(lines) + "\n").encode())
+        if m or _MEDIA.match(path):
+            if owner._inject_error():
+                with owner._lock:
+                    owner.stats["errors_injected"] += 1
+                return self._send(owner.error_status, "text/plain", b"injected error")
+            if m:
+                return self._send_media(None, owner.segment_size, "video/mp2t", int(m.group("seg")))
+            fmt = _MEDIA.match(path).group("fmt")
+            ctype = "audio/mp4" if fmt.startswith("a") else "video/mp4"
+            return self._send_media(owner._files.get(fmt), owner._size(fmt), ctype)
+        self._send(404, "text/plain", b"not found")
+
+    do_HEAD = do_GET
+
+    def _send(self, status, ctype, body):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_media(self, path, size, ctype, salt=0):
+        start, end = 0, size - 1
+        m = _RANGE.match(self.headers.get("Range") or "")
+        status = 200
+        if m:
+            start = int(m.group(1))
+            end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            if start >= size:
+                return self._send(416, "text/plain", b"")
+            status = 206
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        f = open(path, "rb") if path else None
+        try:
+            if f:
+                f.seek(start)
+            pos, chunk = start, 64 << 10
+            began = time.monotonic()
+            while pos <= end:
+                n = min(chunk, end - pos + 1)
+                if f:
+                    data = f.read(n)
+                else:
+                    off = (pos + salt * 7919) % (len(_BLOCK) // 2)
+                    data = _BLOCK[off:off + n]
+                self.wfile.write(data)
+                pos += n
+                bandwidth = self.server_owner.bandwidth
+                if bandwidth:
+                    ahead = (pos - start) / bandwidth - (time.monotonic() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+            with self.server_owner._lock:
+                self.server_owner.stats["bytes_sent"] += end - start + 1
+        except OSError:
+            pass
+        finally:
+            if f:
+                f.close()
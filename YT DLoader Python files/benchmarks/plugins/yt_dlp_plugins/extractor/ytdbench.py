@@ -0,0 +1,11 @@
+"""yt-dlp extractor plugin for ``benchmarks/mediaserver.py`` (loaded via ``use_stub_extractor``)."""
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class YTDBenchIE(InfoExtractor):
+    IE_NAME = "ytdbench"
+    _VALID_URL = r"(?P<base>https?://(?:127\.0\.0\.1|localhost):\d+)/watch/(?P<id>[\w-]+)"
+
+    def _real_extract(self, url):
+        base, video_id = self._match_valid_url(url).group("base", "id")
+        return self._download_json(f"{base}/api/video/{video_id}", video_id, note="Downloading bench info")
@@ -0,0 +1,120 @@
+"""Cold-start benchmark for YT DLoader.
+
+Each sample runs in a fresh interpreter and records, from the first line of
+the child process:
+
+* ``import_s``        — GUI module imported (or engine only with ``--headless``)
+* ``first_window_s``  — main window created and painted once
+* ``first_fetch_s``   — first ``engine.fetch`` of ``--url`` finished
+
+Usage::
+
+    python benchmarks/startup.py --runs 5 --url https://youtu.be/...
+    python benchmarks/startup.py --headless --budget-window 1.5 --json out.json
+
+With ``--budget-window``/``--budget-fetch`` the script exits with status 1
+when the median exceeds the budget, so it can gate CI.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+GUI_SCRIPT = os.path.join(APP_DIR, "YTD v2.py")
+
+
+def _child(args):
+    t0 = time.perf_counter()
+    sys.path.insert(0, APP_DIR)
+    result = {}
+    app = None
+    if args.headless:
+        from ytdloader import engine
+        result["import_s"] = time.perf_counter() - t0
+        engine.preload()
+    else:
+        spec = importlib.util.spec_from_file_location("ytd_gui", GUI_SCRIPT)
+        gui = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(gui)
+        engine = gui.engine
+        result["import_s"] = time.perf_counter() - t0
+        app = gui.YTDLoader()
+        app.update()
+        result["first_window_s"] = time.perf_counter() - t0
+    if args.url:
+        engine.fetch(args.url)
+        result["first_fetch_s"] = time.perf_counter() - t0
+    if app is not None:
+        app._on_close()  # stops the job queue, extraction pool and monitor like closing the window
+    print(json.dumps(result))
+
+
+def _sample(args):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child"]
+    if args.headless:
+        cmd.append("--headless")
+    if args.url:
+        cmd += ["--url", args.url]
+    # Keep the app's config, journal, archive and caches out of the user's profile, and
+    # start each sample cold, with nothing cached or left to resume.
+    workdir = tempfile.mkdtemp(prefix="ytd-startup-home-")
+    env = dict(os.environ, YTDLOADER_HOME=workdir)
+    try:
+        start = time.perf_counter()
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True, cwd=workdir, env=env).stdout
+        wall = time.perf_counter() - start
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    result = json.loads(out.strip().splitlines()[-1])
+    result["process_wall_s"] = wall
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--url", help="URL to fetch once the window is up")
+    parser.add_argument("--headless", action="store_true", help="measure the engine without the GUI")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--budget-window", type=float, help="max median first_window_s")
+    parser.add_argument("--budget-fetch", type=float, help="max median first_fetch_s")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args)
+        return 0
+
+    samples = [_sample(args) for _ in range(args.runs)]
+    summary = {}
+    for key in sorted({k for s in samples for k in s}):
+        values = [s[key] for s in samples if key in s]
+        summary[key] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+    report = {"runs": args.runs, "headless": args.headless, "url": args.url,
+              "python": sys.version.split()[0], "summary": summary, "samples": samples}
+
+    for key, stats in summary.items():
+        print(f"{key:16} median {stats['median'] * 1000:8.1f} ms"
+              f"   (min {stats['min'] * 1000:.1f}, max {stats['max'] * 1000:.1f})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    status = 0
+    for budget, key in ((args.budget_window, "first_window_s"), (args.budget_fetch, "first_fetch_s")):
+        if budget is not None and key in summary and summary[key]["median"] > budget:
+            print(f"{key} median {summary[key]['median']:.3f}s exceeds budget {budget:.3f}s")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
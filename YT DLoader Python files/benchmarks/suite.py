@@ -0,0 +1,272 @@
+"""Offline benchmark suite for YT DLoader.
+
+Runs the app's real fetch and download paths against ``mediaserver.py``
+(a local stand-in for the video site, reached through the ``ytdbench``
+yt-dlp extractor plugin), so the numbers do not depend on YouTube or the
+network. Scenarios:
+
+* ``fetch``        — ``engine.fetch`` latency (``fetch_s``)
+* ``progressive``  — one single-file format
+* ``fragmented``   — one HLS format, fragments fetched concurrently
+* ``merge``        — separate video + audio formats merged by ffmpeg (needs ffmpeg)
+* ``parallel``     — ``--parallel`` progressive downloads at once
+* ``ui``           — the GUI's ``_fetch_worker`` and download path, measuring how
+  long items wait in the UI queue (needs customtkinter and a display)
+
+Download scenarios go through ``JobQueue`` and ``isolated.download`` like the
+app and report ``ttfb_s`` (job start to first byte, including the download
+process start-up), ``download_s``, ``throughput_mbps``, ``merge_s``
+(post-processing) and ``total_s``.
+
+Usage::
+
+    python benchmarks/suite.py --runs 3 --json results.json
+    python benchmarks/suite.py --scenarios fragmented --latency 0.05 --error-rate 0.05
+    python benchmarks/suite.py --bandwidth 2M --parallel 8
+
+Results are written as JSON with the server settings and environment, so
+runs on air-gapped CI can be compared with each other.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+GUI_SCRIPT = os.path.join(APP_DIR, "YTD v2.py")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, HERE)
+
+import mediaserver  # noqa: E402
+from ytdloader import engine, isolated  # noqa: E402
+from ytdloader.bandwidth import parse_rate  # noqa: E402
+from ytdloader.jobs import JobQueue, DONE  # noqa: E402
+
+SCENARIOS = ("fetch", "progressive", "fragmented", "merge", "parallel", "ui")
+
+
+def _fetch(server, args, run):
+    start = time.perf_counter()
+    engine.fetch(server.watch_url(f"fetch{run}"))
+    return [{"fetch_s": time.perf_counter() - start}]
+
+
+def _download(server, args, run, fmt, count=1, fragments=None):
+    outdir = tempfile.mkdtemp(prefix="ytd-bench-out-")
+    marks = {}
+
+    def on_event(kind, job, payload):
+        m = marks.setdefault(job.id, {})
+        now = time.perf_counter()
+        if kind == "started":
+            m["started"] = now
+        elif kind == "progress" and payload.get("downloaded") and "first_byte" not in m:
+            m["first_byte"] = now
+        elif kind == "log" and "finished downloading" in str(payload):
+            m["downloaded"] = now
+        elif kind == "finished":
+            m["finished"] = now
+
+    opts = engine.build_download_options(outdir, "Video", template="%(id)s.%(ext)s", fragments=fragments)
+    opts.update(format=fmt, noprogress=True)
+    jobs = JobQueue(isolated.download, max_workers=count, on_event=on_event)
+    try:
+        start = time.perf_counter()
+        submitted = [jobs.submit(server.watch_url(f"dl{run}x{i}"), opts) for i in range(count)]
+        for job in submitted:
+            job.wait(args.timeout)
+        wall = time.perf_counter() - start
+        samples = []
+        for job in submitted:
+            if job.state != DONE:
+                raise RuntimeError(f"job #{job.id} {job.state}: {job.error}")
+            m = marks[job.id]
+            size = os.path.getsize(job.result) if job.result and os.path.isfile(job.result) else 0
+            sample = {"total_s": m["finished"] - m["started"], "bytes": size}
+            if "first_byte" in m:
+                sample["ttfb_s"] = m["first_byte"] - m["started"]
+            if "first_byte" in m and "downloaded" in m:
+                sample["download_s"] = m["downloaded"] - m["first_byte"]
+                sample["merge_s"] = m["finished"] - m["downloaded"]
+                if sample["download_s"] > 0:
+                    sample["throughput_mbps"] = size * 8 / sample["download_s"] / 1e6
+            samples.append(sample)
+        if count > 1:
+            total = sum(s["bytes"] for s in samples)
+            samples.append({"wall_s": wall, "aggregate_mbps": total * 8 / wall / 1e6})
+        return samples
+    finally:
+        jobs.shutdown(cancel=True)
+        shutil.rmtree(outdir, ignore_errors=True)
+
+
+def _ui(server, args, run):
+    """Drive the GUI headlessly (it still needs a display) and time its queue."""
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("ytd_gui", GUI_SCRIPT)
+    gui = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(gui)
+    from ytdloader.frameclock import WakingQueue
+
+    waits = []
+
+    class TimedQueue(WakingQueue):
+        def put(self, item, block=True, timeout=None):
+            super().put((time.perf_counter(), item), block, timeout)
+
+        def get(self, block=True, timeout=None):
+            stamp, item = super().get(block, timeout)
+            waits.append(time.perf_counter() - stamp)
+            return item
+
+    gui._ffmpeg_warning_shown = True  # no modal dialog in the middle of a run
+    app = gui.YTDLoader()
+    outdir = tempfile.mkdtemp(prefix="ytd-bench-ui-")
+    try:
+        app.queue = TimedQueue(app.clock.wake)
+        url = server.watch_url(f"ui{run}")
+
+        def pump(done):
+            deadline = time.monotonic() + args.timeout
+            while not done():
+                if time.monotonic() > deadline:
+                    raise RuntimeError("GUI did not finish in time")
+                app.update()
+                time.sleep(0.002)
+
+        start = time.perf_counter()
+        app.url_var.set(url)
+        app._fetch_formats(url)
+        pump(lambda: app.last_fetch is not None and app.fetch_thread is None and app.queue.empty())
+        fetch_ui_s = time.perf_counter() - start
+
+        app.out_dir_var.set(outdir)
+        app.res_var.set("360p")
+        start = time.perf_counter()
+        app._on_download()
+        pump(lambda: app.jobs.jobs() and not app.jobs.active() and app.queue.empty())
+        download_ui_s = time.perf_counter() - start
+    finally:
+        app._on_close()
+        shutil.rmtree(outdir, ignore_errors=True)
+    waits.sort()
+    return [{"fetch_ui_s": fetch_ui_s, "download_ui_s": download_ui_s,
+             "queue_wait_p50_ms": waits[len(waits) // 2] * 1000 if waits else None,
+             "queue_wait_p95_ms": waits[int(len(waits) * 0.95)] * 1000 if waits else None,
+             "queue_wait_max_ms": waits[-1] * 1000 if waits else None,
+             "queue_items": len(waits)}]
+
+
+def _scenario(name, server, args, run):
+    if name == "fetch":
+        return _fetch(server, args, run)
+    if name == "progressive":
+        return _download(server, args, run, "p360")
+    if name == "fragmented":
+        return _download(server, args, run, "hls480", fragments=args.fragments)
+    if name == "merge":
+        return _download(server, args, run, "v720+a128")
+    if name == "parallel":
+        return _download(server, args, run, "p360", count=args.parallel)
+    if name == "ui":
+        return _ui(server, args, run)
+    raise ValueError(name)
+
+
+def _skip_reason(name):
+    if name == "merge" and not engine.find_ffmpeg():
+        return "ffmpeg not found"
+    if name == "ui":
+        import importlib.util
+        if importlib.util.find_spec("customtkinter") is None:
+            return "customtkinter not installed"
+        if os.name != "nt" and not os.environ.get("DISPLAY"):
+            return "no display"
+    return None
+
+
+def _summarize(samples):
+    summary = {}
+    for key in sorted({k for s in samples for k in s}):
+        values = [s[key] for s in samples if s.get(key) is not None]
+        if values:
+            summary[key] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset")
+    parser.add_argument("--parallel", type=int, default=4, help="jobs in the parallel scenario")
+    parser.add_argument("--fragments", type=int, default=4, help="fragment concurrency in the fragmented scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--bandwidth", type=parse_rate, help="per-connection cap, e.g. 5M")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of media requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--video-mb", type=float, default=8)
+    parser.add_argument("--segments", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=120, help="per-run timeout in seconds")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # Keep the app's config, archive, journal and caches out of the user's profile.
+    workdir = tempfile.mkdtemp(prefix="ytd-bench-home-")
+    os.environ["YTDLOADER_HOME"] = workdir
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    mediaserver.use_stub_extractor()
+    server = mediaserver.MediaServer(video_size=int(args.video_mb * (1 << 20)), segments=args.segments,
+                                     latency=args.latency, bandwidth=args.bandwidth,
+                                     error_rate=args.error_rate, error_status=args.error_status,
+                                     real_media=True)
+    results = {}
+    try:
+        server.start()
+        for name in names:
+            reason = _skip_reason(name)
+            if reason:
+                results[name] = {"skipped": reason}
+                print(f"{name:12} skipped: {reason}")
+                continue
+            samples, errors = [], []
+            for run in range(args.runs):
+                try:
+                    samples.extend(_scenario(name, server, args, run))
+                except Exception as e:
+                    errors.append(str(e))
+            results[name] = {"summary": _summarize(samples), "samples": samples, "errors": errors}
+            for key, stats in results[name]["summary"].items():
+                print(f"{name:12} {key:18} median {stats['median']:10.3f}"
+                      f"   (min {stats['min']:.3f}, max {stats['max']:.3f})")
+            for err in errors:
+                print(f"{name:12} error: {err}")
+    finally:
+        server.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"runs": args.runs, "server": server.config(), "server_stats": server.stats,
+              "environment": {"python": sys.version.split()[0], "platform": platform.platform(),
+                              "yt_dlp": engine.yt_dlp().version.__version__,
+                              "ffmpeg": engine.find_ffmpeg()},
+              "scenarios": results}
+    if args.json:
+        with open(os.path.join(cwd, args.json), "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if any(r.get("errors") for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3 @@
+"""GUI-independent building blocks used by YT DLoader."""
+
+__version__ = "2.0"
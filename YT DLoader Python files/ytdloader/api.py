@@ -0,0 +1,494 @@
+"""Local HTTP/JSON control API for the download queue.
+
+``python -m ytdloader serve`` runs it without the GUI, on the same
+``JobQueue`` and download processes. Requests and responses are JSON;
+request bodies must be sent as ``Content-Type: application/json``:
+
+* ``GET /health`` — version and queue depths
+* ``GET /jobs`` (``?state=running``) — jobs the queue still remembers
+* ``POST /jobs`` — ``{"url": ...}`` or ``{"urls": [...]}``, optionally with
+  ``resolution`` (e.g. 720), ``audio``, ``audio_format``, ``container``,
+  ``weight`` and ``force`` (download even if archived); playlist URLs are listed in the background and their entries
+  submitted as they come
+* ``GET /jobs/<id>``, ``PATCH /jobs/<id>`` (``{"weight": 2}``),
+  ``DELETE /jobs/<id>`` or ``POST /jobs/<id>/cancel``, ``POST /cancel`` (all)
+* ``GET /limits``, ``PUT /limits`` — ``{"limit": "5M", "off_hours_limit": null,
+  "business_hours": "9-18"}``; fields left out are kept, ``null`` clears them
+* ``GET /events`` (``?job=<id>``) — server-sent events, one per job event
+  (``queued``, ``started``, ``progress``, ``log``, ``phase``, ``handoff``,
+  ``finished``) with ``{"job": ..., "payload": ...}`` as data
+* ``GET /metrics`` — the ``MetricsRecorder`` Prometheus text
+
+It listens on 127.0.0.1 by default. Every request must send
+``Authorization: Bearer <token>`` (or ``?token=`` for ``EventSource``);
+without a configured token a random one is created and kept in
+``api_token`` in the app data folder. Requests from web pages (an
+``Origin`` other than this server) and requests for another host name
+(DNS rebinding) are refused.
+"""
+import hmac
+import itertools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import __version__, engine
+from .bandwidth import parse_hours, parse_rate
+from .jobs import FINISHED_STATES
+
+DEFAULT_PORT = 8765
+TOKEN_ENV_VAR = "YTDLOADER_API_TOKEN"
+TOKEN_FILE = "api_token"
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+MAX_BODY = 4 * 1024 * 1024
+KEEPALIVE = 15.0
+PRUNE_INTERVAL = 60.0
+
+
+class ApiError(Exception):
+    """A request the API refuses; ``status`` is the HTTP status sent back."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def saved_token(path):
+    """The token stored in ``path``; a random one is written there (owner-only) the first time."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            token = f.read().strip()
+        if token:
+            return token
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token + "\n")
+    return token
+
+
+def job_json(job):
+    return {"id": job.id, "uid": job.uid, "url": job.url, "key": job.key, "state": job.state,
+            "weight": job.weight, "progress": job.progress or None, "result": job.result,
+            "error": str(job.error) if job.error else None, "created_at": job.created_at,
+            "started_at": job.started_at, "finished_at": job.finished_at}
+
+
+class _Subscriber:
+    def __init__(self, job_id, backlog):
+        self.job_id = job_id
+        self.events = queue.Queue(backlog)
+        self.dropped = False
+
+
+class EventHub:
+    """Fans job events out to server-sent-event streams.
+
+    Pass it (or a function calling it) as ``JobQueue(on_event=...)``.
+    Progress is forwarded at most every ``progress_interval`` seconds per
+    job. A subscriber more than ``backlog`` events behind is dropped rather
+    than slowing the download workers down.
+    """
+
+    def __init__(self, progress_interval=0.5, backlog=1000):
+        self.progress_interval = progress_interval
+        self.backlog = backlog
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._last_progress = {}
+        self._ids = itertools.count(1)
+
+    def __call__(self, kind, job, payload):
+        if kind == "progress":
+            now = time.monotonic()
+            with self._lock:
+                if now - self._last_progress.get(job.id, 0) < self.progress_interval:
+                    return
+                self._last_progress[job.id] = now
+        elif kind == "finished":
+            with self._lock:
+                self._last_progress.pop(job.id, None)
+        self.publish(kind, {"job": job_json(job), "payload": payload}, job.id)
+
+    def publish(self, kind, data, job_id=None):
+        with self._lock:
+            if not self._subscribers:
+                return
+            event = (next(self._ids), kind, json.dumps(data, default=str))
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            if sub.job_id is not None and sub.job_id != job_id:
+                continue
+            try:
+                sub.events.put_nowait(event)
+            except queue.Full:
+                sub.dropped = True
+                self.unsubscribe(sub)
+
+    def subscribe(self, job_id=None):
+        sub = _Subscriber(job_id, self.backlog)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def close(self):
+        with self._lock:
+            subscribers, self._subscribers = list(self._subscribers), set()
+        for sub in subscribers:
+            sub.dropped = True
+
+
+class ControlServer:
+    """Serves the API for ``jobs`` (a ``JobQueue`` whose events go to ``hub``).
+
+    ``defaults`` holds the download settings a request does not give:
+    ``output``, ``template``, ``resolution``, ``audio``, ``audio_format``,
+    ``container``, ``fragments`` and ``direct_merge``. With an ``archive``,
+    URLs already downloaded in the requested format are skipped. Finished
+    jobs are forgotten ``keep_finished`` seconds after they end. Without a
+    ``token``, the one in ``token_file`` (``saved_token``) is required.
+    """
+
+    def __init__(self, jobs, hub, host="127.0.0.1", port=DEFAULT_PORT, defaults=None, governor=None,
+                 metrics=None, archive=None, token=None, keep_finished=3600):
+        self.jobs = jobs
+        self.hub = hub
+        self.host = host
+        self.port = port
+        self.defaults = dict(defaults or {})
+        self.governor = governor
+        self.metrics = metrics
+        self.archive = archive
+        self.token_file = None if token else os.path.join(engine.app_data_dir(), TOKEN_FILE)
+        self.token = token or saved_token(self.token_file)
+        self.keep_finished = keep_finished
+        self._httpd = None
+        self._stop = threading.Event()
+
+    @property
+    def address(self):
+        host, port = self._httpd.server_address[:2] if self._httpd else (self.host, self.port)
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.api = self
+        threading.Thread(target=self._httpd.serve_forever, daemon=True, name="ytd-api").start()
+        threading.Thread(target=self._prune_loop, daemon=True, name="ytd-api-prune").start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self.hub.close()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def _prune_loop(self):
+        while not self._stop.wait(PRUNE_INTERVAL):
+            if self.keep_finished is not None:
+                self.jobs.forget_finished(older_than=self.keep_finished)
+
+    def local_request(self, headers):
+        """False for requests a web page could have made: a foreign ``Origin`` or ``Host``."""
+        port = self._httpd.server_address[1] if self._httpd else self.port
+        names = LOCAL_HOSTS if self.host in LOCAL_HOSTS + WILDCARD_HOSTS else LOCAL_HOSTS + (self.host,)
+        allowed = {f"{name}:{port}" for name in names}
+        origin = headers.get("Origin")
+        if origin is not None and urlsplit(origin).netloc not in allowed:
+            return False
+        # Bound to every interface, clients use names and addresses we cannot know: the token has to do.
+        return self.host in WILDCARD_HOSTS or headers.get("Host") in allowed
+
+    def authorized(self, headers, query):
+        sent = headers.get("Authorization", "")
+        sent = sent[7:] if sent.startswith("Bearer ") else (query.get("token") or [""])[0]
+        return hmac.compare_digest(sent.encode(), self.token.encode())
+
+    # Requests
+
+    def health(self):
+        return {"ok": True, "version": __version__, "depths": self.jobs.depths()}
+
+    def list_jobs(self, query):
+        states = set((query.get("state") or [""])[0].split(",")) - {""}
+        return {"jobs": [job_json(j) for j in self.jobs.jobs() if not states or j.state in states]}
+
+    def job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ApiError(404, f"no job {job_id}")
+        return job
+
+    def submit(self, body):
+        urls = body.get("urls") or ([body["url"]] if body.get("url") else [])
+        if isinstance(urls, str):
+            urls = [urls]
+        if not urls or not all(isinstance(u, str) and u.strip() for u in urls):
+            raise ApiError(400, "give 'url' or a list of 'urls'")
+        settings = self._settings(body)
+        weight = _weight(body["weight"]) if "weight" in body else None
+        submitted, skipped, playlists = [], [], []
+        for url in (u.strip() for u in urls):
+            if engine.is_playlist_url(url):
+                playlists.append(url)
+                threading.Thread(target=self._submit_playlist, args=(url, settings, weight),
+                                 daemon=True, name="ytd-api-playlist").start()
+                continue
+            job = self._submit_one(url, settings, weight)
+            if job is None:
+                skipped.append(url)
+            else:
+                submitted.append(job_json(job))
+        return {"jobs": submitted, "skipped": skipped, "playlists": playlists}
+
+    def _settings(self, body):
+        d = self.defaults
+        audio = bool(body.get("audio", d.get("audio")))
+        resolution = body.get("resolution", d.get("resolution"))
+        if resolution:
+            try:
+                resolution = f"{int(str(resolution).rstrip('p'))}p"
+            except ValueError:
+                raise ApiError(400, f"invalid resolution: {resolution!r}") from None
+        audio_format = body.get("audio_format", d.get("audio_format")) or engine.DEFAULT_AUDIO_FORMAT
+        if audio_format not in [codec for _, codec in engine.AUDIO_FORMATS]:
+            raise ApiError(400, f"invalid audio_format: {audio_format!r}")
+        container = body.get("container", d.get("container")) or engine.DEFAULT_CONTAINER
+        if container not in engine.CONTAINERS:
+            raise ApiError(400, f"invalid container: {container!r}")
+        mode = "Audio" if audio else "Video"
+        options = engine.build_download_options(d.get("output") or engine.DEFAULT_OUTDIR, mode, resolution,
+                                                template=d.get("template"), fragments=d.get("fragments"),
+                                                audio_format=audio_format,
+                                                direct_merge=d.get("direct_merge", False), container=container)
+        options["noprogress"] = True
+        return mode, resolution, audio_format, container, options, bool(body.get("force"))
+
+    def _submit_one(self, url, settings, weight, playlist_entry=False):
+        mode, resolution, audio_format, container, options, force = settings
+        key = engine.job_key(url, mode, resolution, audio_format, container,
+                             self.defaults.get("output") or engine.DEFAULT_OUTDIR)
+        if self.archive is not None and key in self.archive and not force:
+            return None
+        job = self.jobs.submit(url, dict(options, noplaylist=True) if playlist_entry else options, key=key)
+        if weight is not None:
+            job.weight = weight
+        return job
+
+    def _submit_playlist(self, url, settings, weight):
+        try:
+            summary, entries = engine.open_playlist(url)
+            self.hub.publish("playlist", {"url": url, "title": summary["title"], "count": summary["count"]})
+            for entry in entries:
+                if self._stop.is_set():
+                    entries.close()
+                    return
+                self._submit_one(entry["url"], settings, weight, playlist_entry=True)
+        except Exception as e:
+            self.hub.publish("playlist_error", {"url": url, "error": str(e)})
+
+    def update_job(self, job_id, body):
+        job = self.job(job_id)
+        if "weight" in body:
+            job.weight = _weight(body["weight"])
+            if self.governor is not None:
+                self.governor.rebalance()
+        return job_json(job)
+
+    def cancel(self, job_id=None):
+        if job_id is not None:
+            self.job(job_id)
+        return {"cancelled": [j.id for j in self.jobs.cancel(job_id)]}
+
+    def _governor(self):
+        if self.governor is None:
+            raise ApiError(404, "no bandwidth governor")
+        return self.governor
+
+    def limits(self):
+        g = self._governor()
+        return {"limit": g.limit, "off_hours_limit": g.off_hours_limit,
+                "business_hours": "-".join(map(str, g.business_hours)) if g.business_hours else None,
+                "current_limit": g.current_limit(), "shares": g.shares()}
+
+    def set_limits(self, body):
+        g = self._governor()
+        changes = {}
+        try:
+            if "limit" in body:
+                changes["limit"] = parse_rate(body["limit"])
+            if "off_hours_limit" in body:
+                changes["off_hours_limit"] = parse_rate(body["off_hours_limit"])
+            if "business_hours" in body:
+                changes["business_hours"] = parse_hours(body["business_hours"]) if body["business_hours"] else None
+        except ValueError as e:
+            raise ApiError(400, str(e)) from None
+        g.set_limits(**changes)
+        return self.limits()
+
+    def prometheus_text(self):
+        if self.metrics is None:
+            raise ApiError(404, "metrics are not recorded")
+        return self.metrics.prometheus_text()
+
+
+def _weight(value):
+    try:
+        weight = float(value)
+    except (TypeError, ValueError):
+        weight = 0
+    if weight <= 0:
+        raise ApiError(400, f"invalid weight: {value!r}")
+    return weight
+
+
+def _job_id(text):
+    try:
+        return int(text)
+    except ValueError:
+        raise ApiError(404, f"no job {text}") from None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = f"ytdloader/{__version__}"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def _handle(self, method):
+        api = self.server.api
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split("/") if p]
+        try:
+            if not api.local_request(self.headers):
+                raise ApiError(403, "cross-site requests are refused")
+            if not api.authorized(self.headers, query):
+                raise ApiError(401, "missing or wrong token")
+            body = self._body() if method in ("POST", "PUT", "PATCH") else {}
+            route = (method, parts[0] if parts else "", len(parts))
+            if route == ("GET", "events", 1):
+                return self._stream(api, query)
+            if route == ("GET", "metrics", 1):
+                return self._send(200, api.prometheus_text().encode(), "text/plain; version=0.0.4")
+            self._send_json(*self._dispatch(api, method, parts, query, body))
+        except ApiError as e:
+            self.close_connection = True  # the request body may be left unread
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self.close_connection = True
+            self._send_json(500, {"error": str(e)})
+
+    def _dispatch(self, api, method, parts, query, body):
+        if parts == ["health"] and method == "GET":
+            return 200, api.health()
+        if parts == ["jobs"]:
+            if method == "GET":
+                return 200, api.list_jobs(query)
+            if method == "POST":
+                return 202, api.submit(body)
+        if parts == ["cancel"] and method == "POST":
+            return 200, api.cancel()
+        if len(parts) >= 2 and parts[0] == "jobs":
+            job_id = _job_id(parts[1])
+            if len(parts) == 2 and method == "GET":
+                return 200, job_json(api.job(job_id))
+            if len(parts) == 2 and method == "PATCH":
+                return 200, api.update_job(job_id, body)
+            if (len(parts) == 2 and method == "DELETE") or (parts[2:] == ["cancel"] and method == "POST"):
+                return 200, api.cancel(job_id)
+        if parts == ["limits"]:
+            if method == "GET":
+                return 200, api.limits()
+            if method == "PUT":
+                return 200, api.set_limits(body)
+        raise ApiError(404 if method == "GET" else 405, f"no route for {method} /{'/'.join(parts)}")
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            raise ApiError(413, "request body too large")
+        ctype = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if length and ctype != "application/json":
+            # Also keeps out the form and text/plain posts a web page can send without asking.
+            raise ApiError(415, "request body must be application/json")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ApiError(400, "request body is not JSON") from None
+        if not isinstance(body, dict):
+            raise ApiError(400, "request body must be a JSON object")
+        return body
+
+    def _stream(self, api, query):
+        job_id = _job_id(query["job"][0]) if query.get("job") else None
+        sub = api.hub.subscribe(job_id)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            # Current state first, so a client connecting late knows where each job stands.
+            for job in api.jobs.jobs():
+                if (job_id is None or job.id == job_id) and job.state not in FINISHED_STATES:
+                    self._write_event(None, "snapshot", json.dumps({"job": job_json(job)}, default=str))
+            while not sub.dropped:
+                try:
+                    event = sub.events.get(timeout=KEEPALIVE)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    continue
+                self._write_event(*event)
+        except OSError:
+            pass  # client went away
+        finally:
+            api.hub.unsubscribe(sub)
+
+    def _write_event(self, event_id, kind, data):
+        head = f"id: {event_id}\n" if event_id is not None else ""
+        self.wfile.write(f"{head}event: {kind}\ndata: {data}\n\n".encode())
+        self.wfile.flush()
+
+    def _send_json(self, status, obj):
+        self._send(status, json.dumps(obj, default=str).encode(), "application/json")
+
+    def _send(self, status, body, ctype):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,46 @@
+"""Persistent index of completed downloads."""
+import os
+import threading
+
+
+class DownloadArchive:
+    """Append-only file of job keys, held in memory as a set for O(1) lookups.
+
+    A key is ``Extractor:id|format[|container]|folder`` (see ``engine.job_key``),
+    so the same video fetched in another format, container or folder is not
+    treated as done.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._keys = set()
+        self._lock = threading.Lock()
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._keys.update(line.strip() for line in f if line.strip())
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key):
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.add(key)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(key + "\n")
+
+    def discard(self, key):
+        """Forget ``key`` (rewrites the file)."""
+        with self._lock:
+            if key not in self._keys:
+                return
+            self._keys.discard(key)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.writelines(k + "\n" for k in sorted(self._keys))
+            os.replace(tmp, self.path)
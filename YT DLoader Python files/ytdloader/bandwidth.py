@@ -0,0 +1,233 @@
+"""Bandwidth limiting: a token bucket per download and one governor sharing a global cap."""
+import re
+import threading
+import time
+
+_RATE = re.compile(r"^\s*([0-9]*\.?[0-9]+)\s*([kmg]?)i?b?(?:/s)?\s*$", re.I)
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+MIN_RATE = 16 * 1024
+_UNCHANGED = object()
+
+
+def parse_rate(text):
+    """Bytes per second from ``"5M"``, ``"500K"``, ``"2.5MB/s"`` or a number; None for ""/0/"off"."""
+    if text is None or isinstance(text, (int, float)):
+        return float(text) if text else None
+    text = str(text).strip()
+    if not text or text.lower() in ("0", "off", "none", "unlimited"):
+        return None
+    m = _RATE.match(text)
+    if not m:
+        raise ValueError(f"invalid rate: {text!r}")
+    return float(m.group(1)) * _UNITS[m.group(2).lower()] or None
+
+
+def parse_hours(text):
+    """``(start, end)`` hours from ``"9-18"``."""
+    start, end = (int(x) for x in str(text).split("-", 1))
+    if not (0 <= start <= 24 and 0 <= end <= 24):
+        raise ValueError(f"invalid hours: {text!r}")
+    return start, end
+
+
+class TokenBucket:
+    """Blocks ``consume`` callers so the long-run rate stays under ``rate`` bytes/s.
+
+    Up to ``burst`` seconds worth of unused rate can be spent at once. A rate
+    of None means unlimited; ``set_rate`` may be called from any thread and
+    takes effect within ``slice`` seconds, even for a caller already waiting.
+    """
+
+    def __init__(self, rate=None, burst=1.0, slice=0.25):
+        self.burst = burst
+        self.slice = slice
+        self._rate = rate
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._rate = rate or None
+
+    def consume(self, n):
+        """Take ``n`` bytes worth of tokens, sleeping while in debt; returns the time slept."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if not self._rate:
+                return 0.0
+            self._tokens -= n
+        slept = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if not self._rate or self._tokens >= 0:
+                    return slept
+                wait = min(-self._tokens / self._rate, self.slice)
+            time.sleep(wait)
+            slept += wait
+
+    def _refill(self, now):
+        if self._rate:
+            self._tokens = min(self._rate * self.burst, self._tokens + (now - self._stamp) * self._rate)
+        else:
+            self._tokens = 0.0
+        self._stamp = now
+
+
+class BandwidthGovernor:
+    """Splits one global download cap between the running jobs.
+
+    ``limit`` applies during business hours (``business_hours`` on
+    ``business_days``, 0 = Monday), ``off_hours_limit`` the rest of the time;
+    without ``business_hours`` ``limit`` always applies. None means unlimited. Each job gets a share proportional to its
+    ``weight``; a job that cannot use its share (slow server, nearly done)
+    keeps a little headroom above its measured speed and the rest goes to
+    the others. ``on_rate(job_id, rate)`` callbacks receive every change.
+    """
+
+    def __init__(self, limit=None, off_hours_limit=None, business_hours=None,
+                 business_days=(0, 1, 2, 3, 4), clock=time.localtime, rebalance_interval=1.0):
+        self.limit = limit
+        self.off_hours_limit = off_hours_limit
+        self.business_hours = business_hours
+        self.business_days = tuple(business_days)
+        self.clock = clock
+        self.rebalance_interval = rebalance_interval
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._last_rebalance = 0.0
+
+    def set_limits(self, limit=_UNCHANGED, off_hours_limit=_UNCHANGED, business_hours=_UNCHANGED):
+        """Change the caps at runtime; running jobs are re-shared immediately.
+
+        Arguments left out keep their value; None lifts a cap or, for
+        ``business_hours``, makes ``limit`` apply around the clock.
+        """
+        with self._lock:
+            if limit is not _UNCHANGED:
+                self.limit = limit
+            if off_hours_limit is not _UNCHANGED:
+                self.off_hours_limit = off_hours_limit
+            if business_hours is not _UNCHANGED:
+                self.business_hours = business_hours
+        self.rebalance()
+
+    def in_business_hours(self):
+        if not self.business_hours:
+            return True
+        t = self.clock()
+        start, end = self.business_hours
+        if t.tm_wday not in self.business_days:
+            return False
+        if start <= end:
+            return start <= t.tm_hour < end
+        return t.tm_hour >= start or t.tm_hour < end
+
+    def current_limit(self):
+        return self.limit if self.in_business_hours() else self.off_hours_limit
+
+    def register(self, job, on_rate):
+        """Start sharing with ``job``; returns its initial rate (None = unlimited)."""
+        with self._lock:
+            self._jobs[job.id] = {"job": job, "on_rate": on_rate, "speed": None, "rate": None,
+                                  "bytes": 0, "since": time.monotonic(), "windows": 0}
+        return self.rebalance().get(job.id)
+
+    def unregister(self, job):
+        with self._lock:
+            self._jobs.pop(job.id, None)
+        self.rebalance()
+
+    def report(self, job, nbytes):
+        """Count ``nbytes`` downloaded by ``job``; re-shares at most every ``rebalance_interval``."""
+        with self._lock:
+            entry = self._jobs.get(job.id)
+            if entry is None:
+                return
+            entry["bytes"] += nbytes
+            due = time.monotonic() - self._last_rebalance >= self.rebalance_interval
+        if due:
+            self.rebalance()
+
+    def shares(self):
+        """Current ``{job_id: rate}`` allocation."""
+        with self._lock:
+            return {job_id: e["rate"] for job_id, e in self._jobs.items()}
+
+    def rebalance(self):
+        with self._lock:
+            now = self._last_rebalance = time.monotonic()
+            for e in self._jobs.values():
+                # Speed over the last window, measured here rather than taken from
+                # yt-dlp, whose figure averages over the whole download.
+                if now - e["since"] >= self.rebalance_interval / 2 and (e["bytes"] or e["windows"]):
+                    speed = e["bytes"] / (now - e["since"])
+                    e["speed"] = speed if e["speed"] is None else (e["speed"] + speed) / 2
+                    e["bytes"], e["since"] = 0, now
+                    e["windows"] += 1
+            total = self.current_limit()
+            # A job is only judged on its speed once it has been downloading for two windows.
+            rates = _fair_shares(total, {job_id: (max(e["job"].weight, 0.01),
+                                                  e["speed"] if e["windows"] >= 2 else None, e["rate"])
+                                         for job_id, e in self._jobs.items()})
+            changed = []
+            for job_id, rate in rates.items():
+                entry = self._jobs[job_id]
+                if not _close(entry["rate"], rate):
+                    entry["rate"] = rate
+                    changed.append((entry["on_rate"], job_id, rate))
+        for on_rate, job_id, rate in changed:
+            try:
+                on_rate(job_id, rate)
+            except Exception:
+                pass
+        return rates
+
+
+def _fair_shares(total, jobs, headroom=1.25, satisfied=0.8):
+    """Weighted max-min split of ``total`` between ``{id: (weight, speed, current_rate)}``.
+
+    Every job gets at least ``MIN_RATE``, or an equal part of ``total`` when
+    that is less; the shares never add up to more than ``total``.
+    """
+    if not total or not jobs:
+        return {job_id: None for job_id in jobs}
+    floor = min(MIN_RATE, float(total) / len(jobs))
+    rates = {}
+    left = dict(jobs)
+    budget = float(total)
+    while left:
+        weight_sum = sum(w for w, _, _ in left.values())
+        capped = {}
+        for job_id, (w, speed, rate) in left.items():
+            share = budget * w / weight_sum
+            # Only jobs that were already limited and still ran well below their
+            # share are considered slow; everything else gets a full share.
+            if speed and rate and speed < satisfied * min(rate, share):
+                capped[job_id] = speed * headroom
+        if not capped:
+            for job_id, (w, _, _) in left.items():
+                rates[job_id] = max(budget * w / weight_sum, floor)
+            break
+        for job_id, rate in capped.items():
+            rates[job_id] = max(rate, floor)
+            budget -= rates[job_id]
+            del left[job_id]
+        budget = max(budget, 0.0)
+    # Floors handed to the last jobs can still overshoot: trim everyone alike.
+    used = sum(rates.values())
+    if used > total:
+        rates = {job_id: rate * total / used for job_id, rate in rates.items()}
+    return rates
+
+
+def _close(a, b, tolerance=0.05):
+    if a is None or b is None:
+        return a is b
+    return abs(a - b) <= tolerance * max(a, b)
@@ -0,0 +1,78 @@
+"""On-disk cache of fetched video metadata, keyed by canonical video ID."""
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class MetadataCache:
+    """SQLite-backed store with a TTL and least-recently-used eviction.
+
+    Entries are plain JSON payloads; reading an entry refreshes its LRU
+    position but not its age, so stale metadata still expires on time.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                " key TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS metadata_lru ON metadata (accessed_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload, fetched_at FROM metadata WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            payload, fetched_at = row
+            with self._db:
+                if self.ttl and now - fetched_at > self.ttl:
+                    self._db.execute("DELETE FROM metadata WHERE key = ?", (key,))
+                    return None
+                self._db.execute("UPDATE metadata SET accessed_at = ? WHERE key = ?", (now, key))
+        try:
+            return json.loads(payload)
+        except ValueError:
+            self.invalidate(key)
+            return None
+
+    def put(self, key, payload):
+        now = time.time()
+        data = json.dumps(payload)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO metadata (key, payload, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, data, now, now))
+            self._db.execute(
+                "DELETE FROM metadata WHERE key IN ("
+                " SELECT key FROM metadata ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+
+    def invalidate(self, key):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM metadata WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM metadata")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
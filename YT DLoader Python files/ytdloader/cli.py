@@ -0,0 +1,352 @@
+"""Command line front end: ``python -m ytdloader fetch|download|batch|resume|serve``."""
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+from . import engine, isolated, profiling
+from .api import DEFAULT_PORT, TOKEN_ENV_VAR, ControlServer, EventHub
+from .archive import DownloadArchive
+from .bandwidth import BandwidthGovernor, parse_hours, parse_rate
+from .cache import MetadataCache
+from .extractpool import ExtractionPool, default_workers
+from .fragments import FragmentTuner
+from .jobs import JobQueue, DONE
+from .journal import JobJournal
+from .metrics import MetricsRecorder
+
+
+def _open_cache(args):
+    if args.no_cache:
+        return None
+    return MetadataCache(os.path.join(engine.app_data_dir(), "metadata.sqlite3"))
+
+
+def _print_fetch(url, as_json, cache=None, refresh=False, extractor=None):
+    result = engine.fetch(url, cache=cache, refresh=refresh, extractor=extractor)
+    video = result["video"]
+    if as_json:
+        options = [{"label": label, "height": h, "size": size, "format_id": format_id}
+                   for label, h, size, format_id in result["options"]]
+        print(json.dumps({"url": url, "video": video, "options": options,
+                          "cached": result["cached"]}, indent=2))
+        return
+    print(video["title"])
+    print(f"  Duration: {engine.format_seconds(video['duration']) or 'Unknown'}")
+    print(f"  By: {video['uploader']}")
+    for label, h, size, format_id in result["options"]:
+        note = f" (~{engine.human_size(size)})" if size else ""
+        print(f"  {label}{note}")
+
+
+def _fetch_all(urls, args, cache):
+    """Resolve several URLs at once in an ``ExtractionPool``; print the results in order."""
+    pool = ExtractionPool(args.workers)
+    futures = {}
+    status = 0
+    try:
+        for url in urls:
+            if url not in futures and (args.refresh or cache is None or cache.get(engine.canonical_key(url)) is None):
+                futures[url] = pool.submit(url)
+        for url in urls:
+            future = futures.get(url)
+            try:
+                _print_fetch(url, args.json, cache, args.refresh,
+                             extractor=(lambda _url, future=future: future.result()) if future else None)
+            except Exception as e:
+                print(f"{url}: {e}", file=sys.stderr)
+                status = 1
+    finally:
+        pool.shutdown()
+    return status
+
+
+def _read_urls(path):
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        urls = []
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                urls.append(line)
+        return urls
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class _Reporter:
+    """Prints job events to stderr, at most one progress line per job per second."""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, kind, job, payload):
+        if kind == "progress":
+            now = time.monotonic()
+            if now - self._last.get(job.id, 0) < self.interval:
+                return
+            self._last[job.id] = now
+            pct = payload.get("pct")
+            line = f"{pct * 100:5.1f}%" if pct is not None else engine.human_size(payload.get("downloaded"))
+            if payload.get("speed"):
+                line += f"  {engine.human_size(payload['speed'])}/s"
+            self.write(f"[#{job.id}] {line}")
+        elif kind == "log":
+            self.write(f"[#{job.id}] {payload}")
+        elif kind == "started":
+            self.write(f"[#{job.id}] started: {job.url}")
+        elif kind == "handoff":
+            self.write(f"[#{job.id}] downloaded, queued for post-processing")
+        elif kind == "finished":
+            detail = job.result if payload == DONE else (job.error or payload)
+            self.write(f"[#{job.id}] {payload}: {detail}")
+
+    def write(self, text):
+        with self._lock:
+            print(text, file=sys.stderr, flush=True)
+
+
+def _journal_path():
+    return os.path.join(engine.app_data_dir(), "journal.jsonl")
+
+
+def _open_queue(args, on_event):
+    """The download queue and what it records to: ``(jobs, archive, journal, governor, metrics, unfinished)``.
+
+    ``unfinished`` lists the jobs a previous run left in the journal, which
+    is compacted to just those on the way.
+    """
+    archive = None if args.no_archive else DownloadArchive(os.path.join(engine.app_data_dir(), "archive.txt"))
+    journal = JobJournal(_journal_path())
+    unfinished = journal.load()
+    if not journal.acquire():
+        print("Another YT DLoader is using the job journal; these downloads cannot be resumed.",
+              file=sys.stderr, flush=True)
+    governor = BandwidthGovernor(limit=args.limit, off_hours_limit=args.off_hours_limit,
+                                 business_hours=args.business_hours)
+    tuner = FragmentTuner(os.path.join(engine.app_data_dir(), "fragment_tuning.json"))
+    metrics_dir = args.metrics or os.path.join(engine.app_data_dir(), "metrics")
+    metrics = MetricsRecorder(os.path.join(metrics_dir, "jobs.jsonl"), os.path.join(metrics_dir, "ytdloader.prom"))
+    jobs = JobQueue(functools.partial(isolated.download, governor=governor, tuner=tuner), max_workers=args.jobs,
+                    on_event=on_event, archive=archive, journal=journal, metrics=metrics,
+                    postprocess_workers=args.postprocess_jobs)
+    return jobs, archive, journal, governor, metrics, unfinished
+
+
+def _run_downloads(urls, args, resume=False):
+    outdir = os.path.abspath(args.output)
+    os.makedirs(outdir, exist_ok=True)
+    mode = "Audio" if args.audio else "Video"
+    resolution = f"{args.resolution}p" if args.resolution else None
+    ydl_opts = engine.build_download_options(outdir, mode, resolution, template=args.template,
+                                             fragments=args.fragments, audio_format=args.audio_format,
+                                             direct_merge=args.direct_merge, container=args.container)
+    ydl_opts["noprogress"] = True
+
+    reporter = _Reporter()
+    jobs, archive, journal, _, _, unfinished = _open_queue(args, reporter)
+    if resume and not unfinished:
+        journal.close()
+        print("Nothing to resume.", file=sys.stderr)
+        return 0
+    submitted = []
+    listing_failed = False
+    for entry in unfinished if resume else ():
+        partial = entry.get("partial_bytes")
+        note = f" ({engine.human_size(partial)} already on disk)" if partial else ""
+        reporter.write(f"Resuming {entry['url']}{note}")
+        submitted.append(jobs.submit(entry["url"], dict(entry["options"], noprogress=True),
+                                     key=entry.get("key"), uid=entry["uid"]))
+
+    def submit(url, opts):
+        key = engine.job_key(url, mode, resolution, args.audio_format, args.container, outdir)
+        if archive is not None and key in archive:
+            reporter.write(f"Already downloaded, skipped: {url}")
+            return
+        job = jobs.submit(url, opts, key=key)
+        if job not in submitted:
+            submitted.append(job)
+
+    try:
+        for url in urls:
+            if not engine.is_playlist_url(url):
+                submit(url, ydl_opts)
+                continue
+            # Entries start downloading while later playlist pages are still being listed.
+            try:
+                summary, entries = engine.open_playlist(url)
+                reporter.write(f"Playlist: {summary['title']}")
+                for entry in entries:
+                    submit(entry["url"], dict(ydl_opts, noplaylist=True))
+            except Exception as e:
+                reporter.write(f"{url}: playlist listing failed: {e}")
+                listing_failed = True
+        for job in submitted:
+            while not job.wait(0.5):
+                pass
+    except KeyboardInterrupt:
+        journal.close()  # interrupted jobs stay resumable
+        jobs.shutdown(keep_partials=True)
+        for job in submitted:
+            job.wait(10)
+        return 130
+    finally:
+        jobs.shutdown(cancel=False)
+        journal.close()
+    failed = [j for j in submitted if j.state != DONE]
+    return 1 if failed or listing_failed else 0
+
+
+def _serve(args):
+    reporter = _Reporter()
+    hub = EventHub()
+
+    def on_event(kind, job, payload):
+        hub(kind, job, payload)
+        if kind != "progress":
+            reporter(kind, job, payload)
+
+    jobs, archive, journal, governor, metrics, unfinished = _open_queue(args, on_event)
+    defaults = {"output": os.path.abspath(args.output), "template": args.template, "audio": args.audio,
+                "resolution": args.resolution, "audio_format": args.audio_format, "container": args.container,
+                "fragments": args.fragments, "direct_merge": args.direct_merge}
+    os.makedirs(defaults["output"], exist_ok=True)
+    server = ControlServer(jobs, hub, args.host, args.port, defaults=defaults, governor=governor,
+                           metrics=metrics, archive=archive,
+                           token=args.token or os.environ.get(TOKEN_ENV_VAR) or None,
+                           keep_finished=args.keep_finished)
+    try:
+        server.start()
+    except OSError as e:
+        print(f"Cannot listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        journal.close()
+        return 1
+    for entry in unfinished:
+        jobs.submit(entry["url"], dict(entry["options"], noprogress=True), key=entry.get("key"), uid=entry["uid"])
+    reporter.write(f"Listening on {server.address} ({len(jobs.jobs())} resumed jobs)")
+    if server.token_file:
+        reporter.write(f"Clients authenticate with the token in {server.token_file}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        journal.close()  # interrupted jobs are resumed by the next start
+        server.close()
+        jobs.shutdown(wait=True, timeout=isolated.KILL_TIMEOUT, keep_partials=True)
+    return 0
+
+
+def _fragments_arg(value):
+    if value == "auto":
+        return None
+    n = int(value)
+    if n < 1:
+        raise ValueError(value)
+    return n
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ytdloader", description="YT DLoader command line")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="write cProfile and tracemalloc dumps of every fetch and download to DIR "
+                             "(same as setting YTDLOADER_PROFILE)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("fetch", help="show title and available resolutions")
+    p.add_argument("urls", nargs="+")
+    p.add_argument("--json", action="store_true", help="print machine-readable output")
+    p.add_argument("--refresh", action="store_true", help="ignore cached metadata and re-fetch")
+    p.add_argument("--no-cache", action="store_true", help="neither read nor write the metadata cache")
+    p.add_argument("-w", "--workers", type=int, default=default_workers(), metavar="N",
+                   help="extraction processes when fetching several URLs (0: one at a time in this process)")
+
+    def add_download_args(p):
+        p.add_argument("-o", "--output", default=engine.DEFAULT_OUTDIR, help="output folder")
+        p.add_argument("-t", "--template", default=engine.DEFAULT_TEMPLATE, help="filename template")
+        p.add_argument("-r", "--resolution", type=int, help="maximum video height, e.g. 720")
+        p.add_argument("-a", "--audio", action="store_true", help="download audio only")
+        p.add_argument("--audio-format", choices=[codec for _, codec in engine.AUDIO_FORMATS],
+                       default=engine.DEFAULT_AUDIO_FORMAT,
+                       help="with --audio: 'best' keeps the original stream without re-encoding (default), "
+                            "m4a/opus re-encode only if the source has another codec, mp3 always re-encodes")
+        p.add_argument("-j", "--jobs", type=int, default=4, help="parallel downloads")
+        p.add_argument("--postprocess-jobs", type=int, default=2, metavar="N",
+                       help="parallel ffmpeg merges/conversions, run apart from the downloads")
+        p.add_argument("--container", choices=sorted(engine.CONTAINERS), default=engine.DEFAULT_CONTAINER,
+                       help="merge container: mp4/webm prefer streams they can hold (mkv otherwise), "
+                            "'auto' takes the best streams in whatever container fits; never re-encodes")
+        p.add_argument("--direct-merge", action="store_true",
+                       help="merge separate video and audio with ffmpeg while downloading, writing only "
+                            "the final file (no resume; off while a speed limit applies)")
+        p.add_argument("--no-archive", action="store_true",
+                       help="download even if already recorded as done, and do not record")
+        p.add_argument("--fragments", type=_fragments_arg, metavar="N",
+                       help="DASH/HLS fragments fetched at once, or 'auto' to tune per site (default)")
+        p.add_argument("--limit", type=parse_rate, metavar="RATE",
+                       help="total speed limit for all downloads, e.g. 5M or 500K")
+        p.add_argument("--off-hours-limit", type=parse_rate, metavar="RATE",
+                       help="total speed limit outside business hours (default: unlimited)")
+        p.add_argument("--business-hours", type=parse_hours, metavar="H-H",
+                       help="hours (Mon-Fri) when --limit applies, e.g. 9-18; default: always")
+        p.add_argument("--metrics", metavar="DIR",
+                       help="where to write jobs.jsonl and ytdloader.prom phase timings "
+                            "(default: the app data folder)")
+
+    p = sub.add_parser("download", help="download one or more URLs")
+    p.add_argument("urls", nargs="+")
+    add_download_args(p)
+
+    p = sub.add_parser("batch", help="download every URL listed in a file ('-' for stdin)")
+    p.add_argument("file")
+    add_download_args(p)
+
+    p = sub.add_parser("resume", help="resume downloads left unfinished by a crash or interruption")
+    add_download_args(p)
+
+    p = sub.add_parser("serve", help="run without a window, taking jobs over a local HTTP/JSON API "
+                                     "(download options become the defaults for submitted jobs)")
+    p.add_argument("--host", default="127.0.0.1", help="address to listen on (default: this machine only)")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default {DEFAULT_PORT})")
+    p.add_argument("--token", help=f"token clients send as 'Authorization: Bearer TOKEN' (or set {TOKEN_ENV_VAR}; "
+                                   "default: a random one saved as api_token in the app data folder)")
+    p.add_argument("--keep-finished", type=float, default=3600, metavar="SECONDS",
+                   help="how long finished jobs stay listed")
+    add_download_args(p)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        profiling.enable(args.profile)
+    if args.command == "fetch":
+        status = 0
+        cache = _open_cache(args)
+        if args.workers > 0 and len(args.urls) > 1:
+            with profiling.profiled("fetch"):
+                return _fetch_all(args.urls, args, cache)
+        for url in args.urls:
+            try:
+                with profiling.profiled("fetch"):
+                    _print_fetch(url, args.json, cache, args.refresh)
+            except Exception as e:
+                print(f"{url}: {e}", file=sys.stderr)
+                status = 1
+        return status
+    if args.command == "serve":
+        return _serve(args)
+    if args.command == "resume":
+        return _run_downloads([], args, resume=True)
+    urls = args.urls if args.command == "download" else _read_urls(args.file)
+    if not urls:
+        print("No URLs given.", file=sys.stderr)
+        return 2
+    return _run_downloads(urls, args)
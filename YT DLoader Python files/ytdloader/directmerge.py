@@ -0,0 +1,96 @@
+"""Direct merging: one ffmpeg process reads the video and audio streams and writes the final file.
+
+Without it, yt-dlp saves each format as a ``.fNNN`` file and ffmpeg reads
+both back to write the merged one. With it, only the merged file is
+written. Imported by ``engine.download`` only when asked for, since it
+imports yt-dlp.
+"""
+import os
+import threading
+import time
+
+from yt_dlp.downloader.external import FFmpegFD
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+from .planner import BeforeDownloadPP
+
+# Protocols ffmpeg reads as well as yt-dlp does. HLS/DASH stay with yt-dlp,
+# which fetches their fragments concurrently.
+DIRECT_PROTOCOLS = ("http", "https")
+WATCH_INTERVAL = 0.5
+
+
+def direct_mergeable(info):
+    """True when the chosen formats can be merged by ffmpeg while downloading."""
+    formats = info.get("requested_formats") or ()
+    return (len(formats) > 1
+            and all(f.get("protocol") in DIRECT_PROTOCOLS for f in formats)
+            and not info.get("section_start") and not info.get("section_end"))
+
+
+class DirectMergePP(BeforeDownloadPP):
+    """``before_dl`` step making ffmpeg the downloader for mergeable format pairs.
+
+    Anything else (a single format, HLS/DASH, no ffmpeg) keeps yt-dlp's own
+    downloaders and the usual merge afterwards. ffmpeg reports no progress,
+    so while it runs the size of its output file is fed to
+    ``progress_hooks`` (the ones the downloader was given) instead.
+    """
+
+    def __init__(self, downloader, job_id=None, emit=None, progress_hooks=()):
+        super().__init__(downloader, job_id, emit)
+        self.progress_hooks = list(progress_hooks)
+        self._stop = threading.Event()
+
+    def run(self, info):
+        params = self._downloader.params
+        if direct_mergeable(info) and self._ffmpeg_ready():
+            params["external_downloader"] = {"default": "ffmpeg"}
+            if self.emit:
+                self.emit("log", f"Job #{self.job_id}: merging while downloading (single ffmpeg pass)")
+            target = self._downloader.prepare_filename(info, "temp")
+            total = sum(f.get("filesize") or f.get("filesize_approx") or 0 for f in info["requested_formats"])
+            threading.Thread(target=self._watch, args=(target, total), daemon=True,
+                             name="ytd-direct-merge-progress").start()
+        else:
+            params.pop("external_downloader", None)
+        return [], info
+
+    def close(self):
+        self._stop.set()
+
+    def _ffmpeg_ready(self):
+        pp = FFmpegPostProcessor(self._downloader)
+        if not pp.available:
+            return False
+        # FFmpegFD checks for ffmpeg on PATH only (it caches the answer), so the
+        # configured one, e.g. the bundled copy, goes first on this process's PATH.
+        folder = os.path.dirname(os.path.abspath(pp.executable))
+        path = os.environ.get("PATH", "")
+        if folder not in path.split(os.pathsep):
+            os.environ["PATH"] = folder + os.pathsep + path
+        return FFmpegFD.available()
+
+    def _watch(self, filename, total):
+        part = filename + ".part"
+        start = time.monotonic()
+        seen = False
+        while not self._stop.wait(WATCH_INTERVAL):
+            try:
+                size = os.path.getsize(part)
+            except OSError:
+                if seen:
+                    return  # renamed to the final name: ffmpeg is done
+                continue
+            seen = True
+            elapsed = time.monotonic() - start
+            speed = size / elapsed if elapsed > 0 else None
+            d = {"status": "downloading", "filename": filename, "tmpfilename": part,
+                 "downloaded_bytes": size, "total_bytes_estimate": total or None,
+                 "speed": speed, "elapsed": elapsed,
+                 "eta": (total - size) / speed if total and speed and total > size else None}
+            for hook in self.progress_hooks:
+                try:
+                    hook(d)
+                except Exception:
+                    return
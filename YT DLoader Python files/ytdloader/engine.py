@@ -0,0 +1,554 @@
+"""Fetch and download logic shared by the GUI and the command line.
+
+Nothing in here imports tkinter, customtkinter or PIL, and yt-dlp itself is
+only imported on first use (or by ``preload`` on a background thread).
+"""
+import importlib
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from .fragments import FragmentStats
+from .metrics import PhaseTimer
+
+DEFAULT_OUTDIR = os.path.join(os.path.expanduser("~"), "Downloads")
+DEFAULT_TEMPLATE = "%(title)s.%(ext)s"
+AUTO_LABEL = "Auto (recommended)"
+
+NETWORK_ERROR_HINTS = ["ssl", "decryption", "timeout", "connection", "network", "http"]
+
+# Offered for playlists, whose entries' formats are only known once each job runs.
+PLAYLIST_HEIGHTS = (2160, 1440, 1080, 720, 480, 360, 240, 144)
+
+# Audio mode targets: (label, FFmpegExtractAudio codec). Only MP3 always re-encodes;
+# the others copy the source stream whenever its codec already fits.
+AUDIO_FORMATS = (
+    ("Original (no re-encode)", "best"),
+    ("M4A (AAC)", "m4a"),
+    ("Opus", "opus"),
+    ("MP3 (re-encode)", "mp3"),
+)
+DEFAULT_AUDIO_FORMAT = "best"
+MP3_QUALITY = "192"
+
+# Merge containers: (merge_output_format preference list, format_sort). yt-dlp
+# merges into the first listed container that holds both streams as they
+# are, so merging stays a stream copy; mkv holds anything. A named container
+# prefers streams it can hold at the same resolution; "auto" takes the best
+# streams and lets the container follow their codecs.
+CONTAINERS = {
+    "mp4": ("mp4/mkv", ["res", "fps", "vcodec:h264", "acodec:aac"]),
+    "webm": ("webm/mkv", ["res", "fps", "vcodec:vp9", "acodec:opus"]),
+    "auto": ("mp4/webm/mkv", None),
+}
+DEFAULT_CONTAINER = "mp4"
+# (video, audio) codec patterns each named container holds without re-encoding,
+# after yt-dlp's own compatibility table; a pinned format pair must match them.
+CONTAINER_CODECS = {
+    "mp4": (r"^(?:avc1|h264|hevc|av01)(?:[.]|$)", r"^(?:mp4a|aacl|ac-4|ec-3)(?:[.]|$)"),
+    "webm": (r"^(?:vp0?9|vp0?8|vp9x|vp8x|av01)(?:[.]|$)", r"^(?:opus|vorbis|vrbs)(?:[.]|$)"),
+}
+
+# Fetched format URLs without an explicit expiry are trusted for this long.
+INFO_MAX_AGE = 30 * 60
+# Reused info must stay valid at least this long after the download starts.
+INFO_EXPIRY_MARGIN = 120
+
+
+def yt_dlp():
+    """The ``yt_dlp`` package, imported on first use."""
+    return importlib.import_module("yt_dlp")
+
+
+def preload():
+    """Start importing yt-dlp (and its YouTube extractor) on a daemon thread."""
+    def load():
+        try:
+            yt_dlp().extractor.get_info_extractor("Youtube")
+        except Exception:
+            pass
+    t = threading.Thread(target=load, daemon=True, name="ytd-preload")
+    t.start()
+    return t
+
+
+def app_dir():
+    """Folder the app runs from (next to the exe when frozen)."""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def app_data_dir():
+    """Per-user folder for caches and state (``YTDLOADER_HOME`` overrides it)."""
+    path = os.environ.get("YTDLOADER_HOME")
+    if not path:
+        if os.name == "nt":
+            base = os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA") or os.path.expanduser("~")
+            path = os.path.join(base, "YT DLoader")
+        else:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+            path = os.path.join(base, "ytdloader")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def find_ffmpeg():
+    """Find FFmpeg: bundled → system PATH. Returns None when missing."""
+    bundled_path = os.path.join(app_dir(), "ffmpeg", "ffmpeg.exe")
+    if os.path.isfile(bundled_path):
+        return bundled_path
+    return shutil.which("ffmpeg")
+
+
+def human_size(num_bytes):
+    try:
+        n = float(num_bytes)
+    except Exception:
+        return "Unknown"
+    if n <= 0:
+        return "0B"
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if n < 1024.0:
+            return f"{n:3.1f} {unit}"
+        n /= 1024.0
+    return f"{n:.1f} PB"
+
+
+def format_seconds(s):
+    try:
+        s = int(float(s))
+    except Exception:
+        return None
+    h = s // 3600
+    m = (s % 3600) // 60
+    sec = s % 60
+    if h:
+        return f"{h}:{m:02d}:{sec:02d}"
+    return f"{m}:{sec:02d}"
+
+
+def is_network_error(exc):
+    err_msg = str(exc).lower()
+    return any(x in err_msg for x in NETWORK_ERROR_HINTS)
+
+
+def canonical_key(url):
+    """Stable ``Extractor:id`` key for a URL, or the URL itself when unknown.
+
+    ``youtu.be/ID``, ``watch?v=ID`` and ``shorts/ID`` all map to ``Youtube:ID``.
+    """
+    url = url.strip()
+    ie = yt_dlp().extractor.get_info_extractor("Youtube")
+    try:
+        if ie.suitable(url):
+            return f"{ie.ie_key()}:{ie.get_temp_id(url)}"
+    except Exception:
+        pass
+    return url
+
+
+def is_playlist_url(url):
+    """True for YouTube playlist, mix and channel URLs (including ``watch?v=..&list=..``)."""
+    url = url.strip()
+    extractor = yt_dlp().extractor
+    try:
+        return (extractor.get_info_extractor("YoutubeTab").suitable(url)
+                and not extractor.get_info_extractor("Youtube").suitable(url))
+    except Exception:
+        return False
+
+
+def open_playlist(url):
+    """Start listing a playlist without resolving any entry's formats.
+
+    Returns ``(summary, entries)``. ``entries`` is a generator that yields
+    ``{"index", "id", "url", "title"}`` dicts while yt-dlp pages through the
+    playlist, so the first entries are available long before the last page
+    has been requested. Close the generator to stop listing early.
+    """
+    ydl = yt_dlp().YoutubeDL({"quiet": True, "no_warnings": True})
+    try:
+        info = ydl.extract_info(url, download=False, process=False)
+        for _ in range(3):
+            if not info or info.get("_type") not in ("url", "url_transparent"):
+                break
+            info = ydl.extract_info(info["url"], download=False, process=False, ie_key=info.get("ie_key"))
+        if not info or info.get("_type") not in ("playlist", "multi_video"):
+            raise ValueError(f"Not a playlist: {url}")
+    except Exception:
+        ydl.close()
+        raise
+
+    def entries():
+        try:
+            for index, entry in enumerate(info.get("entries") or [], 1):
+                if not entry:
+                    continue
+                entry_url = entry.get("webpage_url") or entry.get("url")
+                if not entry_url:
+                    continue
+                yield {"index": index, "id": entry.get("id"), "url": entry_url,
+                       "title": entry.get("title") or entry_url}
+        finally:
+            ydl.close()
+
+    summary = {
+        "title": info.get("title") or url,
+        "uploader": info.get("uploader") or info.get("channel") or "Unknown",
+        "count": info.get("playlist_count"),
+        "thumbnail": (info.get("thumbnails") or [{}])[-1].get("url"),
+    }
+    return summary, entries()
+
+
+def playlist_format_options():
+    """Resolution table offered for a playlist before any entry is resolved."""
+    return [(AUTO_LABEL, None, None, None)] + [(f"{h}p", h, None, None) for h in PLAYLIST_HEIGHTS]
+
+
+def audio_codec(value):
+    """FFmpegExtractAudio codec for an ``AUDIO_FORMATS`` label or codec name."""
+    for label, codec in AUDIO_FORMATS:
+        if value in (label, codec):
+            return codec
+    return DEFAULT_AUDIO_FORMAT
+
+
+def job_key(url, mode="Video", resolution=None, audio_format=None, container=DEFAULT_CONTAINER, outdir=None):
+    """Archive/de-duplication key: canonical video, the requested format and where it goes.
+
+    Video keys include the merge ``container``; with ``outdir`` the key also
+    names the output folder, so the same download into another folder is
+    not treated as done.
+    """
+    if mode == "Audio":
+        codec = audio_codec(audio_format)
+        fmt = "audio" if codec == DEFAULT_AUDIO_FORMAT else f"audio-{codec}"
+    else:
+        if not resolution or resolution in (AUTO_LABEL, "Fetching..."):
+            fmt = "video-auto"
+        else:
+            fmt = f"video-{resolution}"
+        fmt += f"|{container if container in CONTAINERS else DEFAULT_CONTAINER}"
+    key = f"{canonical_key(url)}|{fmt}"
+    if outdir:
+        key += f"|{os.path.normcase(os.path.abspath(outdir))}"
+    return key
+
+
+def build_format_options(info):
+    """Resolution table for an info dict: ``[(label, height, total_size, format_id), ...]``."""
+    formats = info.get("formats", []) or []
+    heights = {}
+    best_audio = None
+    for f in formats:
+        if (not f.get("vcodec") or f.get("vcodec") == "none") and f.get("acodec") and f.get("acodec") != "none":
+            if best_audio is None or (f.get("abr") or 0) > (best_audio.get("abr") or 0):
+                best_audio = f
+        if f.get("vcodec") and f.get("vcodec") != "none":
+            h = f.get("height")
+            if h:
+                current = heights.get(h)
+                score = (f.get("tbr") or 0) + (f.get("width") or 0)/1000.0
+                if current is None or score > current[0]:
+                    heights[h] = (score, f)
+    heights_list = sorted([h for h in heights.keys() if isinstance(h, int)], reverse=True)
+
+    options = [(AUTO_LABEL, None, None, None)]
+    for h in heights_list:
+        entry = heights[h][1]
+        vsize = entry.get("filesize") or entry.get("filesize_approx") or 0
+        a_size = best_audio.get("filesize") or best_audio.get("filesize_approx") or 0 if best_audio else 0
+        total = None
+        if vsize or a_size:
+            total = (vsize or 0) + (a_size or 0)
+        format_id = entry.get("format_id")
+        if format_id and best_audio and best_audio.get("format_id") and entry.get("acodec") in (None, "none"):
+            format_id = f"{format_id}+{best_audio['format_id']}"
+        options.append((f"{h}p", h, total, format_id))
+    return options
+
+
+def _option_tuple(option):
+    """Pad cached option rows written before format IDs were stored."""
+    option = tuple(option)
+    return option + (None,) * (4 - len(option))
+
+
+def video_summary(info):
+    return {
+        "title": info.get("title", "Unknown"),
+        "duration": info.get("duration"),
+        "uploader": info.get("uploader", "Unknown"),
+        "thumbnail": info.get("thumbnail"),
+    }
+
+
+def extract(url):
+    """Extract metadata for ``url`` in this process; ``fetch`` without the cache."""
+    ydl_opts = {"quiet": True, "no_warnings": True}
+    with yt_dlp().YoutubeDL(ydl_opts) as ydl:
+        info = ydl.sanitize_info(ydl.extract_info(url, download=False), remove_private_keys=True)
+    return {"key": canonical_key(url), "info": info, "video": video_summary(info),
+            "options": build_format_options(info), "cached": False}
+
+
+def fetch(url, cache=None, refresh=False, extractor=None):
+    """Extract metadata without downloading.
+
+    Returns ``{"key", "info", "video", "options", "cached"}``; ``info`` is the
+    JSON-safe info dict that ``download`` can reuse. With a ``MetadataCache``,
+    a fresh entry is returned without touching the network (``info`` is then
+    None); ``refresh`` forces a new extraction. ``extractor(url)`` replaces
+    ``extract``, e.g. ``ExtractionPool.extract`` to run it in another process.
+    """
+    key = canonical_key(url)
+    if cache is not None and not refresh:
+        hit = cache.get(key)
+        if hit:
+            return {"key": key, "info": None, "video": hit["video"],
+                    "options": [_option_tuple(o) for o in hit["options"]], "cached": True}
+
+    result = (extractor or extract)(url)
+    if cache is not None:
+        try:
+            cache.put(key, {"video": result["video"], "options": result["options"]})
+        except Exception:
+            pass
+    return result
+
+
+def info_expires_at(info):
+    """Earliest time any format URL in ``info`` stops working."""
+    expiries = []
+    for f in info.get("formats") or []:
+        for key in ("url", "manifest_url"):
+            url = f.get(key)
+            if not url:
+                continue
+            expire = parse_qs(urlparse(url).query).get("expire", [None])[0]
+            if expire is None:
+                m = re.search(r"/expire/(\d+)", url)
+                expire = m and m.group(1)
+            if expire and str(expire).isdigit():
+                expiries.append(int(expire))
+    if expiries:
+        return min(expiries)
+    return (info.get("epoch") or 0) + INFO_MAX_AGE
+
+
+def info_is_reusable(info, now=None):
+    """True when a fetched single-video info dict can still be downloaded from."""
+    if not info or info.get("_type", "video") != "video" or info.get("is_live"):
+        return False
+    now = time.time() if now is None else now
+    return info_expires_at(info) - INFO_EXPIRY_MARGIN > now
+
+
+def format_selector(mode, resolution=None, options=None, audio_format=None, container="auto"):
+    """yt-dlp format string for "Video"/"Audio" mode and a "720p"-style label.
+
+    The exact format ID the fetched ``options`` table has for the label is
+    tried first. For a named container it is only taken when its codecs fit
+    that container, and its audio half is the best audio stream the
+    container holds (the table pairs the highest bitrate, often Opus);
+    otherwise the container's stream preference picks the pair. In audio
+    mode a source stream that can be copied into ``audio_format`` is
+    preferred.
+    """
+    if mode == "Audio":
+        codec = audio_codec(audio_format)
+        if codec == "m4a":
+            return "bestaudio[ext=m4a]/bestaudio/best"
+        if codec == "opus":
+            return "bestaudio[acodec=opus]/bestaudio/best"
+        return "bestaudio/best"
+    if not resolution or resolution == AUTO_LABEL or resolution == "Fetching...":
+        return "bestvideo+bestaudio/best"
+    try:
+        h = int(str(resolution).split("p")[0].strip())
+    except Exception:
+        return "bestvideo+bestaudio/best"
+    fmt = f"bestvideo[height<={h}]+bestaudio/best"
+    for option in options or []:
+        label, _, _, format_id = _option_tuple(option)
+        if label == resolution and format_id:
+            return f"{_pinned(format_id, container)}/{fmt}"
+    return fmt
+
+
+def _pinned(format_id, container):
+    """``format_id`` ("137+140" or "18"), filtered to codecs ``container`` holds as they are.
+
+    A video+audio pair keeps its video stream and takes the best audio
+    stream the container holds, whichever the table paired it with.
+    """
+    if container not in CONTAINER_CODECS:
+        return format_id
+    vcodecs, acodecs = CONTAINER_CODECS[container]
+    ids = format_id.split("+")
+    if len(ids) == 2:
+        return f"{ids[0]}[vcodec~='{vcodecs}']+bestaudio[acodec~='{acodecs}']"
+    return f"{format_id}[vcodec~='{vcodecs}'][acodec~='^(?:none$|{acodecs[1:]})']"
+
+
+def build_download_options(outdir, mode="Video", resolution=None, template=DEFAULT_TEMPLATE,
+                           ffmpeg_location=None, options=None, fragments=None, audio_format=None,
+                           direct_merge=False, container=DEFAULT_CONTAINER):
+    """yt-dlp options for one download job.
+
+    ``fragments`` fixes how many DASH/HLS fragments are fetched at once;
+    leave it None to let a ``FragmentTuner`` choose. ``audio_format`` is an
+    ``AUDIO_FORMATS`` codec or label: "best" keeps the source audio as it is
+    (remuxed, never re-encoded), "m4a"/"opus" re-encode only when the source
+    has another codec, "mp3" always re-encodes. ``direct_merge`` lets ffmpeg
+    merge separate video and audio while downloading instead of afterwards.
+    ``container`` is a ``CONTAINERS`` key choosing how video and audio are
+    paired and what they are merged into.
+    """
+    if container not in CONTAINERS:
+        container = DEFAULT_CONTAINER
+    merge_formats, format_sort = CONTAINERS[container]
+    ydl_opts = {
+        "format": format_selector(mode, resolution, options, audio_format, container),
+        "outtmpl": os.path.join(outdir, template or DEFAULT_TEMPLATE),
+        "merge_output_format": merge_formats,
+        "noplaylist": False,
+        "continuedl": True,
+        "quiet": True,
+        "no_warnings": True,
+        "retries": 5,
+        "fragment_retries": 10,
+        "sleep_interval": 1,
+        "max_sleep_interval": 5,
+        "ffmpeg_location": ffmpeg_location or find_ffmpeg() or "ffmpeg",
+    }
+    if format_sort and mode != "Audio":
+        ydl_opts["format_sort"] = list(format_sort)
+    if fragments:
+        ydl_opts["concurrent_fragment_downloads"] = int(fragments)
+    if direct_merge and mode != "Audio":
+        ydl_opts["direct_merge"] = True
+    if mode == "Audio":
+        extract = {"key": "FFmpegExtractAudio", "preferredcodec": audio_codec(audio_format)}
+        if extract["preferredcodec"] == "mp3":
+            extract["preferredquality"] = MP3_QUALITY
+        ydl_opts["postprocessors"] = [extract]
+    return ydl_opts
+
+
+def progress_snapshot(d):
+    """Reduce a yt-dlp progress-hook dict to the fields the UIs display."""
+    total = d.get("total_bytes") or d.get("total_bytes_estimate") or 0
+    downloaded = d.get("downloaded_bytes") or 0
+    if not downloaded:
+        downloaded = d.get("bytes_downloaded") or 0
+
+    pct = None
+    if total and total > 0:
+        try:
+            pct = float(downloaded) / float(total)
+            pct = max(0.0, min(1.0, pct))
+        except Exception:
+            pct = None
+    sp = d.get("speed") or d.get("download_speed") or None
+    eta = d.get("eta") or d.get("estimated_time") or None
+    return {"pct": pct, "eta": eta, "speed": sp, "downloaded": downloaded, "total": total,
+            "filename": d.get("filename"), "tmpfilename": d.get("tmpfilename")}
+
+
+def progress_hook(job, emit):
+    """yt-dlp progress hook reporting ``job`` progress through ``emit``."""
+    def hook(d):
+        job.check_cancelled()
+
+        st = d.get("status")
+        if st == "downloading":
+            job.progress = progress_snapshot(d)
+            emit("progress", job.progress)
+        elif st == "finished":
+            emit("log", f"Job #{job.id}: finished downloading — post-processing...")
+        elif st == "error":
+            emit("log", f"Job #{job.id}: network retrying chunk...")
+    return hook
+
+
+def download(job, emit):
+    """JobQueue runner: download ``job.url`` with ``job.options`` as yt-dlp options.
+
+    A still-valid info dict from ``fetch`` (``job.info``) skips the second
+    extraction; expired or rejected info falls back to extracting the URL.
+    Phase timestamps (extraction, first byte, transfer and post-processing)
+    are reported as ``phase`` events. Returns the path of the final file.
+
+    With the ``direct_merge`` option, separate video and audio formats are
+    merged by ffmpeg while they download (see ``directmerge``).
+    """
+    timer = PhaseTimer(emit)
+    ydl_opts = dict(job.options)
+    direct_merge = ydl_opts.pop("direct_merge", False)
+    ydl_opts["progress_hooks"] = [progress_hook(job, emit), timer.progress_hook]
+    ydl_opts["postprocessor_hooks"] = [timer.postprocessor_hook]
+    if ydl_opts.get("concurrent_fragment_downloads"):
+        stats = FragmentStats(job.id, ydl_opts["concurrent_fragment_downloads"], emit)
+        ydl_opts["progress_hooks"].append(stats.hook)
+        ydl_opts.setdefault("logger", stats)
+    with yt_dlp().YoutubeDL(ydl_opts) as ydl:
+        from .planner import PlanLogPP
+        ydl.add_post_processor(PlanLogPP(ydl, job.id, emit), when="before_dl")
+        merger = None
+        if direct_merge:
+            from .directmerge import DirectMergePP
+            merger = DirectMergePP(ydl, job.id, emit, progress_hooks=ydl_opts["progress_hooks"])
+            ydl.add_post_processor(merger, when="before_dl")
+        try:
+            return _download_with(ydl, job, emit, timer)
+        finally:
+            if merger is not None:
+                merger.close()
+
+
+def _download_with(ydl, job, emit, timer):
+    utils = yt_dlp().utils
+    if info_is_reusable(job.info):
+        try:
+            timer.mark("extract_start", reused=True)
+            timer.mark("extract_end")
+            info = ydl.process_ie_result(dict(job.info), download=True)
+            return _finish_download(ydl, info, timer)
+        except utils.DownloadError:
+            job.check_cancelled()
+            emit("log", f"Job #{job.id}: fetched formats expired, extracting again...")
+    # Extract and download as two steps (what extract_info does inside) to time extraction.
+    timer.mark("extract_start")
+    ie_result = ydl.extract_info(job.url, download=False, process=False)
+    timer.mark("extract_end")
+    try:
+        info = ydl.process_ie_result(ie_result, download=True)
+    except (utils.ExtractorError, utils.UnavailableVideoError) as e:
+        ydl.report_error(str(e))  # raises DownloadError, as extract_info would
+        raise
+    return _finish_download(ydl, info, timer)
+
+
+def _finish_download(ydl, info, timer):
+    path = output_path(ydl, info)
+    try:
+        written = os.path.getsize(path)
+    except (OSError, TypeError):
+        written = None
+    timer.mark("written", bytes_written=written)
+    return path
+
+
+def output_path(ydl, info):
+    """Final file of a finished download (after merging/conversion), else the template name."""
+    for d in reversed(info.get("requested_downloads") or []):
+        if d.get("filepath"):
+            return d["filepath"]
+    return info.get("filepath") or ydl.prepare_filename(info)
@@ -0,0 +1,151 @@
+"""Metadata extraction in a pool of worker processes.
+
+yt-dlp's extraction is mostly Python work (regexes, JSON, signature
+deciphering), so on threads it competes with the UI and with other fetches
+for the GIL. Here it runs in spawned processes, each recycled after
+``max_tasks_per_child`` extractions to give its memory back, and a crashing
+extractor takes down a worker instead of the app.
+"""
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+import threading
+
+from . import engine, profiling
+
+# Info dict keys no download reads back; on YouTube the caption tables alone
+# are often larger than everything else, so they are dropped before the
+# result crosses back to the parent.
+HEAVY_KEYS = ("automatic_captions", "subtitles", "heatmap", "thumbnails", "requested_subtitles")
+
+
+def default_workers():
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+def compact_info(info):
+    """A copy of ``info`` without ``HEAVY_KEYS`` (the best ``thumbnail`` URL stays)."""
+    if not isinstance(info, dict):
+        return info
+    return {k: v for k, v in info.items() if k not in HEAVY_KEYS}
+
+
+def _extract(url):
+    # Profiled here, in the worker: the caller's profile only shows it waiting.
+    with profiling.profiled("extract"):
+        result = engine.extract(url)
+    result["info"] = compact_info(result["info"])
+    return result
+
+
+def _warm():
+    engine.yt_dlp().extractor.get_info_extractor("Youtube")
+    return os.getpid()
+
+
+class ExtractionPool:
+    """Runs ``engine.extract`` in up to ``max_workers`` processes.
+
+    ``extract(url)`` blocks like ``engine.extract`` and is meant to be passed
+    to ``engine.fetch(extractor=...)``; ``submit`` returns a future for
+    resolving many URLs at once. Processes start on first use (or ``warm``).
+    """
+
+    def __init__(self, max_workers=None, max_tasks_per_child=25, timeout=None):
+        self.max_workers = max(1, int(max_workers or default_workers()))
+        self.max_tasks_per_child = max_tasks_per_child
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._tasks = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is not None and self.max_tasks_per_child and sys.version_info < (3, 11):
+                # No max_tasks_per_child before Python 3.11: replace the whole pool instead.
+                if self._tasks >= self.max_tasks_per_child * self.max_workers:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+            if self._executor is None:
+                kwargs = {"max_workers": self.max_workers, "mp_context": multiprocessing.get_context("spawn")}
+                if self.max_tasks_per_child and sys.version_info >= (3, 11):
+                    kwargs["max_tasks_per_child"] = self.max_tasks_per_child
+                self._executor = concurrent.futures.ProcessPoolExecutor(**kwargs)
+                self._tasks = 0
+            self._tasks += 1
+            return self._executor
+
+    def _discard(self, executor):
+        """Replace ``executor``, killing its workers: a hung one would never exit on its own."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # Other extractions still running in it fail with BrokenProcessPool.
+        for proc in list((getattr(executor, "_processes", None) or {}).values()):
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, url):
+        """Start extracting ``url``; returns a future of what ``engine.extract`` returns.
+
+        It fails with RuntimeError when the worker crashed and with
+        TimeoutError after ``timeout`` seconds; either way the pool is
+        replaced, so the next extraction gets fresh processes.
+        """
+        executor = self._pool()
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+
+        def settle(outcome, value):
+            if timer is not None:
+                timer.cancel()
+            try:
+                outcome(value)
+            except concurrent.futures.InvalidStateError:
+                pass  # timed out and finished at about the same time: the first one counts
+
+        def done(task):
+            if task.cancelled():
+                settle(future.set_exception, RuntimeError("the extraction pool was shut down"))
+            elif isinstance(task.exception(), concurrent.futures.process.BrokenProcessPool):
+                self._discard(executor)
+                settle(future.set_exception, RuntimeError("the extraction process crashed"))
+            elif task.exception() is not None:
+                settle(future.set_exception, task.exception())
+            else:
+                settle(future.set_result, task.result())
+
+        def expire():
+            if not future.done():
+                self._discard(executor)
+                settle(future.set_exception, concurrent.futures.TimeoutError())
+
+        timer = None
+        if self.timeout:
+            timer = threading.Timer(self.timeout, expire)
+            timer.daemon = True
+            timer.start()
+        executor.submit(_extract, url).add_done_callback(done)
+        return future
+
+    def extract(self, url):
+        return self.submit(url).result()
+
+    def warm(self):
+        """Start the worker processes and import yt-dlp in them, in the background."""
+        try:
+            pool = self._pool()
+            for _ in range(self.max_workers):
+                pool.submit(_warm)
+        except Exception:
+            pass
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
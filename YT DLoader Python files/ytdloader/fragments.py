@@ -0,0 +1,137 @@
+"""Self-tuning concurrency for fragmented (DASH/HLS) downloads."""
+import json
+import os
+import threading
+
+THROTTLE_HINTS = ("429", "too many requests", "403", "forbidden", "throttl", "rate limit")
+
+
+class FragmentStats:
+    """Measures one job's fragmented downloads from yt-dlp's progress hook and log.
+
+    Pass it as the ``logger`` yt-dlp option (it counts retry and throttling
+    warnings and drops all other output) and call ``hook`` from a progress
+    hook. When a fragmented format finishes, ``emit("fragments", stats)``
+    reports its size, time, fragment count, retries and throttling hits.
+    """
+
+    def __init__(self, job_id, level, emit):
+        self.job_id = job_id
+        self.level = level
+        self.emit = emit
+        self.retries = 0
+        self.throttled = 0
+        self._formats = {}
+        self._announced = False
+
+    def hook(self, d):
+        name = d.get("filename")
+        status = d.get("status")
+        if status == "downloading" and d.get("fragment_count"):
+            if not self._announced:
+                self._announced = True
+                self.emit("log", f"Job #{self.job_id}: fetching fragments {self.level} at a time")
+            self._formats[name] = {"fragments": d.get("fragment_count"), "retries": self.retries,
+                                   "throttled": self.throttled}
+        elif status == "finished" and name in self._formats:
+            start = self._formats.pop(name)
+            elapsed = d.get("elapsed") or 0
+            size = d.get("total_bytes") or d.get("downloaded_bytes") or 0
+            if elapsed > 0 and size:
+                self.emit("fragments", {"level": self.level, "bytes": size, "seconds": elapsed,
+                                        "fragments": start["fragments"],
+                                        "retries": self.retries - start["retries"],
+                                        "throttled": self.throttled - start["throttled"]})
+
+    # yt-dlp logger interface
+
+    def debug(self, msg):
+        pass
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        text = str(msg).lower()
+        if "retrying" in text:
+            self.retries += 1
+        if any(hint in text for hint in THROTTLE_HINTS):
+            self.throttled += 1
+
+    def error(self, msg):
+        pass
+
+
+class FragmentTuner:
+    """Chooses ``concurrent_fragment_downloads`` per host by hill climbing.
+
+    Each finished fragmented format is recorded with the level it used.
+    While throughput keeps growing the level ramps up; when a higher level
+    brings no gain it steps back; throttling or a retry rate above
+    ``max_error_rate`` halves it. After ``probe_after`` downloads on a
+    plateau it tries one level higher again. State is kept in ``path``.
+    """
+
+    def __init__(self, path=None, initial=4, minimum=1, maximum=16, max_error_rate=0.02, probe_after=8):
+        self.path = path
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_error_rate = max_error_rate
+        self.probe_after = probe_after
+        self._lock = threading.Lock()
+        self._hosts = {}
+        if path and os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self._hosts = data
+            except Exception:
+                pass
+
+    def level(self, host):
+        with self._lock:
+            state = self._hosts.get(host or "")
+            level = state["level"] if state else self.initial
+        return max(self.minimum, min(self.maximum, level))
+
+    def record(self, host, stats):
+        """Feed one format's ``FragmentStats`` result; returns the level for the next download."""
+        throughput = stats["bytes"] / stats["seconds"]
+        level = stats["level"]
+        errors = stats["retries"] / max(stats["fragments"] or 1, 1)
+        with self._lock:
+            state = self._hosts.setdefault(host or "", {"level": level, "prev": None, "stable": 0})
+            prev = state.get("prev")
+            if stats["throttled"] or errors > self.max_error_rate:
+                new = level // 2
+            elif prev is None or (level > prev[0] and throughput > prev[1] * 1.1):
+                new = level + max(1, level // 2)
+            elif level > prev[0] and throughput < prev[1] * 0.95:
+                new = prev[0]
+            else:
+                new = level
+            if new == level:
+                state["stable"] = state.get("stable", 0) + 1
+                if state["stable"] >= self.probe_after:
+                    new, state["stable"] = level + 1, 0
+            else:
+                state["stable"] = 0
+            state["level"] = max(self.minimum, min(self.maximum, new))
+            state["prev"] = [level, throughput]
+            new = state["level"]
+            self._save()
+        return new
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._hosts, f)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
@@ -0,0 +1,123 @@
+"""One Tk ``after()`` clock for animations and UI-queue draining."""
+import queue
+import threading
+import time
+
+WAKE_EVENT = "<<YTDLoaderWake>>"
+
+
+class FrameClock:
+    """Drives every periodic UI task from a single ``after()`` timer.
+
+    ``on_frame()`` runs on each tick and returns the number of seconds until
+    it needs to run again (or None when it has nothing left to do).
+    Animations registered with ``animate`` run at their own interval while
+    the window is mapped. When no animation is running and ``on_frame`` is
+    idle, no timer is scheduled at all; worker threads call ``wake()`` to
+    get the next tick instead of the UI polling for them.
+    """
+
+    def __init__(self, root, on_frame, min_interval=1 / 60):
+        self.root = root
+        self.on_frame = on_frame
+        self.min_interval = min_interval
+        self._animations = {}
+        self._after_id = None
+        self._next_tick = None
+        self._wake_requested = threading.Event()
+        self._visible = True
+        root.bind(WAKE_EVENT, lambda e: self._schedule(0), add="+")
+        root.bind("<Map>", self._on_map, add="+")
+        root.bind("<Unmap>", self._on_unmap, add="+")
+
+    def animate(self, name, interval, step):
+        """Call ``step()`` every ``interval`` seconds until ``stop(name)``."""
+        self._animations[name] = [interval, step, 0.0]
+        self._schedule(0)
+
+    def stop(self, name):
+        self._animations.pop(name, None)
+
+    def is_animating(self, name):
+        return name in self._animations
+
+    def wake(self):
+        """Request a tick as soon as possible; safe to call from any thread."""
+        if self._wake_requested.is_set():
+            return
+        self._wake_requested.set()
+        if threading.current_thread() is threading.main_thread():
+            self._schedule(0)
+            return
+        try:
+            self.root.event_generate(WAKE_EVENT, when="tail")
+        except Exception:
+            self._wake_requested.clear()
+
+    def start(self):
+        self._schedule(0)
+
+    def _on_map(self, event):
+        if event.widget is self.root:
+            self._visible = True
+            self._schedule(0)
+
+    def _on_unmap(self, event):
+        if event.widget is self.root:
+            self._visible = False
+
+    def _schedule(self, delay):
+        due = time.monotonic() + max(delay, 0)
+        if self._after_id is not None:
+            if self._next_tick is not None and self._next_tick <= due:
+                return
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._next_tick = due
+        self._after_id = self.root.after(int(max(delay, 0) * 1000), self._tick)
+
+    def _tick(self):
+        self._after_id = None
+        self._next_tick = None
+        self._wake_requested.clear()
+        now = time.monotonic()
+
+        delays = []
+        try:
+            wanted = self.on_frame()
+        except Exception:
+            wanted = None
+        if wanted is not None:
+            delays.append(wanted)
+
+        if self._visible:
+            for name, anim in list(self._animations.items()):
+                interval, step, last = anim
+                if now - last >= interval:
+                    anim[2] = now
+                    try:
+                        step()
+                    except Exception:
+                        self._animations.pop(name, None)
+                        continue
+                    delays.append(interval)
+                else:
+                    delays.append(interval - (now - last))
+
+        if delays:
+            self._schedule(max(min(delays), self.min_interval))
+
+
+class WakingQueue(queue.Queue):
+    """``queue.Queue`` that wakes a ``FrameClock`` whenever an item is put."""
+
+    def __init__(self, wake=None):
+        super().__init__()
+        self.wake = wake
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        if self.wake:
+            self.wake()
@@ -0,0 +1,240 @@
+"""Downloads in a child process, so cancelling can stop them at any point."""
+import glob
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import subprocess
+import threading
+import time
+from urllib.parse import urlparse
+
+from . import engine, profiling
+from .bandwidth import TokenBucket
+from .jobs import Handoff, Job, JobCancelled
+
+POLL_INTERVAL = 0.1
+KILL_TIMEOUT = 5.0
+GOVERNED_BUFFER = 256 * 1024
+# Post-processors too cheap to be worth a trip through the post-processing pool.
+LIGHT_POSTPROCESSORS = ("MoveFiles",)
+
+_FORMAT_SUFFIX = re.compile(r"\.f[0-9][0-9A-Za-z_-]*$")
+
+
+class DownloadFailed(Exception):
+    """A download failed inside the child process; the message is yt-dlp's."""
+
+
+def download(job, emit, governor=None, tuner=None):
+    """JobQueue runner: ``engine.download`` in a child process.
+
+    The child runs in its own process group (its own console tree on
+    Windows), together with any ffmpeg it starts. Cancelling the job kills
+    that whole tree, whatever it is doing — extracting, waiting on a stalled
+    socket or merging — then deletes the partial files it left behind, so
+    the worker slot is free again within ``POLL_INTERVAL`` plus the kill.
+    An interrupted job (``Job.interrupt``, at shutdown) is killed the same
+    way but its partial files are left for a later resume.
+
+    With a ``BandwidthGovernor`` (bind it with ``functools.partial``), the
+    job's share of the global cap is sent to the child whenever it changes
+    and enforced there by a token bucket in the progress hook. With a
+    ``FragmentTuner``, jobs that do not set ``concurrent_fragment_downloads``
+    get the tuned level for their host and report back how it performed.
+
+    When the transfer is done and ffmpeg work (merging, audio extraction,
+    fixups) is next, the child waits and a ``Handoff`` is returned; its
+    ``finish`` lets the child go on and returns the final result, so the
+    post-processing can run outside the download worker slot.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    events = ctx.Queue()
+    control = ctx.Queue()
+    options = job.options
+    host = urlparse(job.url).hostname or ""
+    if tuner is not None and not options.get("concurrent_fragment_downloads"):
+        options = dict(options, concurrent_fragment_downloads=tuner.level(host))
+    rate = None
+    if governor is not None:
+        rate = governor.register(job, lambda job_id, rate: control.put(("rate", rate)))
+        # Fixed-size reads keep the throttled rate smooth; yt-dlp otherwise grows them to megabytes.
+        options = dict(options, buffersize=GOVERNED_BUFFER, noresizebuffer=True)
+        if options.get("direct_merge") and governor.current_limit():
+            # ffmpeg would read the streams itself, past the token bucket.
+            options["direct_merge"] = False
+    proc = ctx.Process(target=_child_main, args=(job.id, job.url, options, job.info, events, control, rate),
+                       name=f"ytd-job-{job.id}", daemon=True)
+    files = set()
+    seen = {}
+
+    def relay():
+        """Relay the child's events until its result, or until it waits to post-process."""
+        while True:
+            if job.cancelled:
+                kill_tree(proc)
+                if not job.interrupted:
+                    remove_partials(files)
+                raise JobCancelled(f"Job #{job.id} cancelled")
+            try:
+                kind, payload = events.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if proc.is_alive():
+                    continue
+                try:
+                    kind, payload = events.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    raise DownloadFailed(f"download process exited with code {proc.exitcode}")
+            if kind == "progress":
+                for name in (payload.get("filename"), payload.get("tmpfilename")):
+                    if name:
+                        files.add(name)
+                job.progress = payload
+                if governor is not None:
+                    governor.report(job, _advance(seen, payload))
+                emit("progress", payload)
+            elif kind in ("log", "phase"):
+                emit(kind, payload)
+            elif kind == "fragments":
+                if tuner is not None:
+                    level = tuner.record(host, payload)
+                    if level != payload["level"]:
+                        emit("log", f"Job #{job.id}: fragment concurrency for {host} tuned to {level}")
+            elif kind == "handoff":
+                return Handoff(finish)
+            elif kind == "result":
+                return payload
+            elif kind == "error":
+                raise DownloadFailed(payload)
+
+    def cleanup():
+        if governor is not None:
+            governor.unregister(job)
+        if proc.is_alive():
+            kill_tree(proc)
+        proc.join(KILL_TIMEOUT)
+        for q in (events, control):
+            q.close()
+            q.cancel_join_thread()
+
+    def finish():
+        try:
+            control.put(("postprocess", None))
+            return relay()
+        finally:
+            cleanup()
+
+    proc.start()
+    result = None
+    try:
+        result = relay()
+        if isinstance(result, Handoff) and governor is not None:
+            governor.unregister(job)  # the transfer is over; its share goes to the other jobs
+        return result
+    finally:
+        if not isinstance(result, Handoff):
+            cleanup()
+
+
+def _child_main(job_id, url, options, info, events, control, rate):
+    if hasattr(os, "setsid"):
+        try:
+            os.setsid()
+        except OSError:
+            pass
+    job = Job(url, options, info)
+    job.id = job_id
+    bucket = TokenBucket(rate)
+    go_postprocess = threading.Event()
+    threading.Thread(target=_control_loop, args=(control, bucket, go_postprocess), daemon=True).start()
+    seen = {}
+
+    def emit(kind, payload=None):
+        if kind == "progress":
+            # Called from inside yt-dlp's progress hook, so sleeping here throttles the read loop.
+            delta = _advance(seen, payload)
+            if delta:
+                bucket.consume(delta)
+        elif (kind == "phase" and payload.get("name") == "postprocess_start" and not go_postprocess.is_set()
+              and payload.get("postprocessor") not in LIGHT_POSTPROCESSORS):
+            # Called from yt-dlp's post-processor hook before the first ffmpeg step:
+            # hold it until the parent has a post-processing slot for this job.
+            events.put(("handoff", None))
+            go_postprocess.wait()
+            payload = dict(payload, t=time.time())
+        events.put((kind, payload))
+
+    try:
+        with profiling.profiled(f"job-{job_id}"):
+            result = engine.download(job, emit)
+        events.put(("result", result))
+    except BaseException as e:
+        events.put(("error", str(e) or type(e).__name__))
+
+
+def _advance(seen, snapshot):
+    """Bytes downloaded since the previous snapshot of the same file."""
+    name = snapshot.get("tmpfilename") or snapshot.get("filename")
+    downloaded = snapshot.get("downloaded") or 0
+    delta = downloaded - seen.get(name, 0)
+    seen[name] = downloaded
+    return max(delta, 0)
+
+
+def _control_loop(control, bucket, go_postprocess):
+    while True:
+        kind, value = control.get()
+        if kind == "rate":
+            bucket.set_rate(value)
+        elif kind == "postprocess":
+            go_postprocess.set()
+
+
+def kill_tree(proc):
+    """Kill ``proc`` and every process it started (ffmpeg included)."""
+    if proc.pid is None:
+        return
+    if os.name == "nt":
+        try:
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0), timeout=KILL_TIMEOUT)
+        except Exception:
+            pass
+    else:
+        try:
+            if os.getpgid(proc.pid) == proc.pid:
+                os.killpg(proc.pid, signal.SIGKILL)
+        except (OSError, ProcessLookupError):
+            pass
+    if proc.is_alive():
+        proc.kill()
+    proc.join(KILL_TIMEOUT)
+
+
+def remove_partials(files, attempts=5):
+    """Delete the ``.part``/``.ytdl`` files and unmerged format files of a killed download."""
+    doomed = set()
+    for name in files:
+        part = name if name.endswith(".part") else name + ".part"
+        final = part[:-len(".part")]
+        stem = glob.escape(_FORMAT_SUFFIX.sub("", os.path.splitext(final)[0]))
+        doomed.update((part, final + ".ytdl"))
+        if _FORMAT_SUFFIX.search(os.path.splitext(final)[0]):
+            doomed.add(final)  # a finished format file that was waiting to be merged
+        for pattern in (glob.escape(final) + ".part-Frag*", stem + ".f[0-9]*.*", stem + ".temp.*"):
+            doomed.update(glob.glob(pattern))
+    # Windows keeps a killed process's handles open for a moment.
+    for _ in range(attempts):
+        left = set()
+        for path in doomed:
+            try:
+                if os.path.isfile(path):
+                    os.remove(path)
+            except OSError:
+                left.add(path)
+        if not left:
+            return
+        doomed = left
+        time.sleep(0.2)
@@ -0,0 +1,340 @@
+"""Download job queue with a bounded pool of worker threads."""
+import itertools
+import queue
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+POSTPROCESSING = "postprocessing"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised from inside a runner once its job has been cancelled."""
+
+
+class Handoff:
+    """Returned by a runner whose transfer is done but whose post-processing is not.
+
+    ``finish()`` runs in the post-processing stage and returns the job result
+    (or raises, like a runner).
+    """
+
+    def __init__(self, finish):
+        self.finish = finish
+
+
+class Job:
+    """One URL to download, with its own state, progress and cancel handle.
+
+    ``weight`` sets the job's share of a global bandwidth cap relative to the
+    other running jobs and may be changed while it runs.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url, options=None, info=None, key=None, uid=None):
+        self.id = next(Job._ids)
+        self.uid = uid or uuid.uuid4().hex
+        self.url = url
+        self.options = dict(options or {})
+        self.info = info
+        self.key = key
+        self.weight = 1.0
+        self.state = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.interrupted = False
+        self.cancel_event = threading.Event()
+        self._finished_event = threading.Event()
+
+    def __repr__(self):
+        return f"<Job #{self.id} {self.state} {self.url}>"
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def interrupt(self):
+        """Stop the job like ``cancel`` but keep its partial files, so it can be resumed."""
+        self.interrupted = True
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job #{self.id} cancelled")
+
+    def wait(self, timeout=None):
+        return self._finished_event.wait(timeout)
+
+
+class JobQueue:
+    """Runs submitted jobs on at most ``max_workers`` threads at once.
+
+    ``runner(job, emit)`` does the actual work and returns the job result;
+    ``emit(kind, payload)`` forwards intermediate events to ``on_event``.
+    ``on_event(kind, job, payload)`` is called from worker threads, so GUI
+    callers should hand the event over to their own thread-safe queue.
+
+    Jobs submitted with a ``key`` are single-flight: submitting a key that an
+    unfinished job already has returns that job instead of a new one. With
+    an ``archive`` (``DownloadArchive``), keys of completed jobs are recorded.
+    With a ``journal`` (``JobJournal``), every job is written ahead so it can
+    be resubmitted after a restart. A ``metrics`` recorder (``MetricsRecorder``)
+    sees every event before ``on_event`` does.
+
+    A runner may return a ``Handoff`` once its transfer is done. With
+    ``postprocess_workers``, the job then moves to a separate pool of that
+    many slots (state ``postprocessing``, event ``handoff``) and the
+    download worker takes the next job right away; without, ``finish`` runs
+    on the download worker as before.
+    """
+
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, runner, max_workers=4, on_event=None, archive=None, journal=None, metrics=None,
+                 postprocess_workers=None):
+        self.runner = runner
+        self.max_workers = max(1, int(max_workers))
+        self.postprocess_workers = max(1, int(postprocess_workers)) if postprocess_workers else None
+        self.on_event = on_event
+        self.archive = archive
+        self.journal = journal
+        self.metrics = metrics
+        self._pending = queue.Queue()
+        self._jobs = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._workers = []
+        self._post_slots = threading.BoundedSemaphore(self.postprocess_workers or 1)
+        self._post_threads = set()
+        self._post_busy = 0
+        self._closed = False
+
+    def start(self):
+        with self._lock:
+            while len(self._workers) < self.max_workers:
+                t = threading.Thread(target=self._worker_loop, daemon=True,
+                                     name=f"ytd-job-worker-{len(self._workers) + 1}")
+                self._workers.append(t)
+                t.start()
+        return self
+
+    def submit(self, url, options=None, info=None, key=None, uid=None):
+        """Queue a download; returns the new job, or the running job with the same key.
+
+        ``uid`` resubmits a journaled job under its original identity.
+        """
+        if self._closed:
+            raise RuntimeError("JobQueue is shut down")
+        with self._lock:
+            existing = self._in_flight.get(key) if key else None
+            if existing is not None and not existing.finished and not existing.cancelled:
+                return existing
+            job = Job(url, options, info, key, uid)
+            self._jobs[job.id] = job
+            if key:
+                self._in_flight[key] = job
+        if self.journal is not None:
+            self.journal.record_queued(job)
+        self._emit(job, "queued", None)
+        self._pending.put(job)
+        self._report_depths()
+        if not self._workers:
+            self.start()
+        return job
+
+    def find(self, key):
+        """The unfinished job submitted with ``key``, if any."""
+        with self._lock:
+            job = self._in_flight.get(key)
+        return job if job is not None and not job.finished else None
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def running(self):
+        return [j for j in self.jobs() if j.state == RUNNING]
+
+    def pending(self):
+        return [j for j in self.jobs() if j.state == QUEUED]
+
+    def postprocessing(self):
+        return [j for j in self.jobs() if j.state == POSTPROCESSING]
+
+    def active(self):
+        return [j for j in self.jobs() if not j.finished]
+
+    def depths(self):
+        """Jobs waiting and working in each stage, to tell network-bound from CPU-bound."""
+        jobs = self.jobs()
+        with self._lock:
+            busy = self._post_busy
+        post = sum(1 for j in jobs if j.state == POSTPROCESSING)
+        return {"download_queued": sum(1 for j in jobs if j.state == QUEUED),
+                "download_running": sum(1 for j in jobs if j.state == RUNNING),
+                "postprocess_queued": max(0, post - busy),
+                "postprocess_running": busy}
+
+    def cancel(self, job_id=None):
+        """Cancel one job, or every unfinished job when ``job_id`` is None."""
+        targets = [self.get(job_id)] if job_id is not None else self.active()
+        cancelled = []
+        for job in targets:
+            if job is not None and not job.finished:
+                job.cancel()
+                cancelled.append(job)
+        return cancelled
+
+    def forget_finished(self, older_than=None):
+        """Drop finished jobs, or only those finished more than ``older_than`` seconds ago."""
+        cutoff = time.time() - older_than if older_than is not None else None
+        with self._lock:
+            for job_id in [i for i, j in self._jobs.items()
+                           if j.finished and (cutoff is None or (j.finished_at or 0) <= cutoff)]:
+                del self._jobs[job_id]
+
+    def shutdown(self, cancel=True, wait=False, timeout=None, keep_partials=False):
+        """Stop taking jobs; with ``cancel``, stop the unfinished ones too.
+
+        With ``keep_partials`` they are interrupted instead of cancelled:
+        downloaded data stays on disk and the journal keeps them unfinished,
+        so they resume on the next start.
+        """
+        self._closed = True
+        if cancel:
+            for job in self.active():
+                if keep_partials:
+                    job.interrupt()
+                else:
+                    job.cancel()
+        for _ in self._workers:
+            self._pending.put(None)
+        if wait:
+            for t in self._workers + list(self._post_threads):
+                t.join(timeout)
+
+    def _emit(self, job, kind, payload):
+        if kind == "progress" and self.journal is not None:
+            self.journal.record_progress(job, payload)
+        if self.metrics is not None:
+            try:
+                self.metrics.on_event(kind, job, payload)
+            except Exception:
+                pass
+        if self.on_event:
+            try:
+                self.on_event(kind, job, payload)
+            except Exception:
+                pass
+
+    def _worker_loop(self):
+        while True:
+            job = self._pending.get()
+            if job is None:
+                return
+            if job.cancelled:
+                self._finish(job, CANCELLED)
+                continue
+            self._run(job)
+
+    def _postprocess(self, job, handoff):
+        # Waits for a post-processing slot; a job cancelled meanwhile is finished (cleaned up) at once.
+        acquired = False
+        while not job.cancelled and not acquired:
+            acquired = self._post_slots.acquire(timeout=self.POLL_INTERVAL)
+        if acquired:
+            with self._lock:
+                self._post_busy += 1
+            self._report_depths()
+        try:
+            self._complete(job, handoff.finish)
+        finally:
+            if acquired:
+                with self._lock:
+                    self._post_busy -= 1
+                self._post_slots.release()
+                self._report_depths()
+            with self._lock:
+                self._post_threads.discard(threading.current_thread())
+
+    def _report_depths(self):
+        if self.metrics is not None:
+            try:
+                self.metrics.set_queue_depths(self.depths())
+            except Exception:
+                pass
+
+    def _run(self, job):
+        job.state = RUNNING
+        job.started_at = time.time()
+        self._emit(job, "started", None)
+        self._report_depths()
+        self._complete(job, lambda: self.runner(job, lambda kind, payload=None: self._emit(job, kind, payload)))
+
+    def _complete(self, job, call):
+        try:
+            result = call()
+            if isinstance(result, Handoff):
+                if self.postprocess_workers:
+                    job.state = POSTPROCESSING
+                    self._emit(job, "handoff", None)
+                    t = threading.Thread(target=self._postprocess, args=(job, result), daemon=True,
+                                         name=f"ytd-postprocess-{job.id}")
+                    with self._lock:
+                        self._post_threads.add(t)
+                    t.start()
+                    self._report_depths()
+                    return
+                result = result.finish()
+            job.result = result
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            job.error = e
+            self._finish(job, CANCELLED if job.cancelled else FAILED)
+        else:
+            self._finish(job, DONE)
+
+    def _finish(self, job, state):
+        job.state = state
+        job.finished_at = time.time()
+        if job.key:
+            with self._lock:
+                if self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+            if state == DONE and self.archive is not None:
+                try:
+                    self.archive.add(job.key)
+                except Exception:
+                    pass
+        if self.journal is not None and not job.interrupted:
+            self.journal.record_finished(job)
+        try:
+            self._emit(job, "finished", state)
+            self._report_depths()
+        finally:
+            # Only now: a caller returning from job.wait() must have seen the final event.
+            job._finished_event.set()
@@ -0,0 +1,183 @@
+"""Write-ahead journal of download jobs, so unfinished work survives a restart."""
+import json
+import os
+import threading
+import time
+
+
+def _jsonable(options):
+    """Copy of yt-dlp ``options`` without values that cannot be stored (hooks, loggers)."""
+    out = {}
+    for k, v in (options or {}).items():
+        try:
+            json.dumps(v)
+        except (TypeError, ValueError):
+            continue
+        out[k] = v
+    return out
+
+
+class JobJournal:
+    """Append-only JSON-lines log of job submissions, progress and outcomes.
+
+    Every submitted job is written (and fsynced) before it starts; progress
+    records with the ``.part`` file name and byte count follow at most every
+    ``progress_interval`` seconds per job; a final record marks the job as
+    done, failed or cancelled. ``load`` folds the file into the jobs that
+    never finished and rewrites it with just those, so it stays small.
+
+    Closing the journal before shutting the queue down keeps the jobs that
+    were interrupted by the shutdown resumable.
+
+    One process at a time owns the journal (``acquire``); in any other it
+    reads and records nothing.
+    """
+
+    def __init__(self, path, progress_interval=5.0):
+        self.path = path
+        self.progress_interval = progress_interval
+        self._lock = threading.Lock()
+        self._last_progress = {}
+        self._file = None
+        self._closed = False
+        self._lock_file = None
+        self._locked_out = False
+
+    def acquire(self):
+        """Take ``<path>.lock`` for this process; False when another process holds it.
+
+        A second instance (another window, ``serve`` next to the GUI) would
+        resume the first one's running jobs and lose records to its
+        compaction. The OS drops the lock with the process, so a crash never
+        leaves it stale.
+        """
+        with self._lock:
+            if self._lock_file is None and not self._locked_out and not self._closed:
+                self._lock_file = _lock(self.path + ".lock")
+                self._locked_out = self._lock_file is None
+            return self._lock_file is not None
+
+    def load(self):
+        """Return the unfinished jobs as dicts and compact the file to just those."""
+        if not self.acquire():
+            return []
+        jobs = {}
+        if os.path.isfile(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn write from a crash
+                    uid = rec.get("uid")
+                    op = rec.get("op")
+                    if op == "queued":
+                        jobs[uid] = {"uid": uid, "url": rec.get("url"), "options": rec.get("options") or {},
+                                     "key": rec.get("key"), "queued_at": rec.get("ts"), "progress": None}
+                    elif op == "progress" and uid in jobs:
+                        jobs[uid]["progress"] = rec
+                    elif op == "finished":
+                        jobs.pop(uid, None)
+        pending = [j for j in jobs.values() if j["url"]]
+        with self._lock:
+            self._close_file()
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for j in pending:
+                    f.write(json.dumps({"op": "queued", "uid": j["uid"], "url": j["url"], "key": j["key"],
+                                        "options": j["options"], "ts": j["queued_at"]}) + "\n")
+                    if j["progress"]:
+                        f.write(json.dumps(j["progress"]) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        for j in pending:
+            j["partial_bytes"] = _partial_bytes(j["progress"])
+        return pending
+
+    def record_queued(self, job):
+        self._write({"op": "queued", "uid": job.uid, "url": job.url, "key": job.key,
+                     "options": _jsonable(job.options), "ts": time.time()}, sync=True)
+
+    def record_progress(self, job, snapshot):
+        now = time.monotonic()
+        if now - self._last_progress.get(job.uid, 0) < self.progress_interval:
+            return
+        self._last_progress[job.uid] = now
+        self._write({"op": "progress", "uid": job.uid, "filename": snapshot.get("filename"),
+                     "tmpfilename": snapshot.get("tmpfilename"),
+                     "downloaded": snapshot.get("downloaded"), "total": snapshot.get("total")})
+
+    def record_finished(self, job):
+        self._last_progress.pop(job.uid, None)
+        self._write({"op": "finished", "uid": job.uid, "state": job.state,
+                     "result": job.result if isinstance(job.result, str) else None}, sync=True)
+
+    def close(self):
+        """Stop recording; later events (e.g. cancellations during shutdown) are ignored."""
+        with self._lock:
+            self._closed = True
+            self._close_file()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def _write(self, record, sync=False):
+        if not self.acquire():
+            return
+        with self._lock:
+            if self._closed:
+                return
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(json.dumps(record) + "\n")
+                self._file.flush()
+                if sync:
+                    os.fsync(self._file.fileno())
+            except Exception:
+                pass
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+
+def _lock(path):
+    """Open ``path`` and lock it without waiting: the open file, or None if it is locked elsewhere."""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        f = open(path, "a+")
+    except OSError:
+        return None
+    try:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def _partial_bytes(progress):
+    """Size of the ``.part`` file a journaled job left behind, or 0."""
+    if not progress:
+        return 0
+    for name in (progress.get("tmpfilename"), progress.get("filename")):
+        try:
+            if name and os.path.isfile(name):
+                return os.path.getsize(name)
+        except OSError:
+            pass
+    return 0
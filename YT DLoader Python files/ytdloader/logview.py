@@ -0,0 +1,75 @@
+"""Bounded, batched log view plus a background rotating log file."""
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from collections import deque
+
+LOGGER_NAME = "ytdloader"
+
+
+class LogBuffer:
+    """Collects log lines and writes them into a Tk ``Text`` widget in batches.
+
+    ``append`` is cheap and thread-safe; ``flush`` (UI thread only) inserts
+    everything pending with one ``insert`` call and trims the widget to the
+    newest ``max_lines`` lines, so a long session keeps a constant footprint.
+    Lines also go to the ``ytdloader`` logger for the full on-disk history.
+    """
+
+    def __init__(self, max_lines=1000):
+        self.max_lines = max(1, int(max_lines))
+        self._pending = deque(maxlen=self.max_lines)
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(LOGGER_NAME)
+
+    def append(self, text):
+        with self._lock:
+            self._pending.append(text)
+        self._logger.info(text)
+
+    def __bool__(self):
+        return bool(self._pending)
+
+    def clear(self, widget=None):
+        with self._lock:
+            self._pending.clear()
+        if widget is not None:
+            widget.configure(state="normal")
+            widget.delete("1.0", "end")
+            widget.configure(state="disabled")
+
+    def flush(self, widget):
+        with self._lock:
+            if not self._pending:
+                return 0
+            lines = list(self._pending)
+            self._pending.clear()
+        widget.configure(state="normal")
+        widget.insert("end", "\n".join(lines) + "\n")
+        excess = int(widget.index("end-1c").split(".")[0]) - 1 - self.max_lines
+        if excess > 0:
+            widget.delete("1.0", f"{excess + 1}.0")
+        widget.see("end")
+        widget.configure(state="disabled")
+        return len(lines)
+
+
+def start_file_log(path, max_bytes=1024 * 1024, backups=5):
+    """Send the ``ytdloader`` logger to a rotating file from a background thread.
+
+    Returns the ``QueueListener``; call ``stop()`` on it at exit to flush.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                   encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    return listener
@@ -0,0 +1,219 @@
+"""Per-job phase timings, exported as JSON lines and a Prometheus text file."""
+import json
+import os
+import threading
+import time
+
+# Phases keep their first timestamp; all others keep the last one (a job
+# with separate video and audio formats transfers twice).
+FIRST_WINS = ("extract_start", "first_byte", "postprocess_start")
+
+DURATIONS = (
+    ("queue_wait", "queued", "started"),
+    ("extract", "extract_start", "extract_end"),
+    ("ttfb", "extract_end", "first_byte"),
+    ("transfer", "first_byte", "transfer_end"),
+    ("postprocess_wait", "handoff", "postprocess_start"),
+    ("postprocess", "postprocess_start", "postprocess_end"),
+    ("total", "started", "finished"),
+)
+
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class PhaseTimer:
+    """Turns yt-dlp progress and post-processor hook calls into ``phase`` events.
+
+    Runs next to yt-dlp (in the download process); every event is
+    ``emit("phase", {"name": ..., "t": epoch seconds, ...})``.
+    """
+
+    def __init__(self, emit):
+        self.emit = emit
+        self._downloaded = {}
+        self._first_byte = False
+
+    def mark(self, name, **extra):
+        extra.update(name=name, t=time.time())
+        self.emit("phase", extra)
+
+    def progress_hook(self, d):
+        status = d.get("status")
+        downloaded = d.get("downloaded_bytes") or d.get("total_bytes") or 0
+        if status in ("downloading", "finished") and downloaded:
+            self._downloaded[d.get("filename")] = downloaded
+        if status == "downloading" and downloaded and not self._first_byte:
+            self._first_byte = True
+            self.mark("first_byte")
+        elif status == "finished":
+            self.mark("transfer_end", bytes_downloaded=sum(self._downloaded.values()))
+
+    def postprocessor_hook(self, d):
+        status = d.get("status")
+        if status == "started":
+            self.mark("postprocess_start", postprocessor=d.get("postprocessor"))
+        elif status == "finished":
+            self.mark("postprocess_end", postprocessor=d.get("postprocessor"))
+
+
+class MetricsRecorder:
+    """Collects ``phase`` events per job and writes them out when the job ends.
+
+    Each finished job appends one JSON object to ``jsonl_path`` (rotated to
+    ``.1`` past ``max_jsonl_bytes``); ``prom_path`` is rewritten atomically
+    with counters and duration histograms for a Prometheus textfile
+    collector. Pass it to ``JobQueue(metrics=...)``, which also reports how
+    many jobs wait and run in each stage; those gauges are rewritten at most
+    every ``depth_interval`` seconds.
+    """
+
+    def __init__(self, jsonl_path=None, prom_path=None, max_jsonl_bytes=10 * 1024 * 1024, depth_interval=1.0):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.max_jsonl_bytes = max_jsonl_bytes
+        self.depth_interval = depth_interval
+        self._lock = threading.Lock()
+        self._open = {}
+        self._jobs_total = {}
+        self._bytes = {"downloaded": 0, "written": 0}
+        self._histograms = {}
+        self._pp = {}
+        self._last_finished = 0.0
+        self._depths = {}
+        self._depths_written = 0.0
+
+    def on_event(self, kind, job, payload):
+        with self._lock:
+            if kind == "queued":
+                self._open[job.id] = {"phases": {"queued": job.created_at}, "postprocessors": [],
+                                      "bytes_downloaded": 0, "bytes_written": None, "_pp_start": {}}
+                return
+            rec = self._open.get(job.id)
+            if rec is None:
+                return
+            if kind == "started":
+                rec["phases"]["started"] = job.started_at or time.time()
+            elif kind == "handoff":
+                rec["phases"]["handoff"] = time.time()
+            elif kind == "phase":
+                self._phase(rec, payload)
+            elif kind == "finished":
+                del self._open[job.id]
+                rec["phases"]["finished"] = job.finished_at or time.time()
+                record = self._finish(job, payload, rec)
+            else:
+                return
+        if kind == "finished":
+            self._write(record)
+
+    def set_queue_depths(self, depths):
+        """Latest ``JobQueue.depths()``."""
+        now = time.monotonic()
+        with self._lock:
+            self._depths = dict(depths)
+            due = now - self._depths_written >= self.depth_interval or not any(self._depths.values())
+            if due:
+                self._depths_written = now
+        if due:
+            self._write(None)
+
+    def _phase(self, rec, payload):
+        name, t = payload.get("name"), payload.get("t")
+        if not name or t is None:
+            return
+        if name not in FIRST_WINS or name not in rec["phases"]:
+            rec["phases"][name] = t
+        if "bytes_downloaded" in payload:
+            rec["bytes_downloaded"] = payload["bytes_downloaded"]
+        if "bytes_written" in payload:
+            rec["bytes_written"] = payload["bytes_written"]
+        pp = payload.get("postprocessor")
+        if pp and name == "postprocess_start":
+            rec["_pp_start"][pp] = t
+        elif pp and name == "postprocess_end" and pp in rec["_pp_start"]:
+            rec["postprocessors"].append({"name": pp, "seconds": t - rec["_pp_start"].pop(pp)})
+
+    def _finish(self, job, state, rec):
+        phases = rec["phases"]
+        durations = {}
+        for name, start, end in DURATIONS:
+            if start in phases and end in phases:
+                durations[name] = max(0.0, phases[end] - phases[start])
+        record = {"job_id": job.id, "uid": getattr(job, "uid", None), "url": job.url, "key": job.key,
+                  "state": state, "error": str(job.error) if job.error else None,
+                  "phases": phases, "durations": durations,
+                  "bytes_downloaded": rec["bytes_downloaded"], "bytes_written": rec["bytes_written"],
+                  "postprocessors": rec["postprocessors"]}
+        self._jobs_total[state] = self._jobs_total.get(state, 0) + 1
+        self._bytes["downloaded"] += rec["bytes_downloaded"] or 0
+        self._bytes["written"] += rec["bytes_written"] or 0
+        for name, seconds in durations.items():
+            self._observe(self._histograms, name, seconds)
+        for pp in rec["postprocessors"]:
+            self._observe(self._pp, pp["name"], pp["seconds"])
+        self._last_finished = phases["finished"]
+        return record
+
+    @staticmethod
+    def _observe(table, name, seconds):
+        h = table.setdefault(name, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h["buckets"][i] += 1
+        h["sum"] += seconds
+        h["count"] += 1
+
+    def _write(self, record):
+        try:
+            if self.jsonl_path and record is not None:
+                os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+                if os.path.isfile(self.jsonl_path) and os.path.getsize(self.jsonl_path) > self.max_jsonl_bytes:
+                    os.replace(self.jsonl_path, self.jsonl_path + ".1")
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            if self.prom_path:
+                os.makedirs(os.path.dirname(self.prom_path) or ".", exist_ok=True)
+                tmp = self.prom_path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(self.prometheus_text())
+                os.replace(tmp, self.prom_path)
+        except Exception:
+            pass
+
+    def prometheus_text(self):
+        with self._lock:
+            lines = ["# HELP ytdloader_jobs_total Finished download jobs by final state.",
+                     "# TYPE ytdloader_jobs_total counter"]
+            for state, n in sorted(self._jobs_total.items()):
+                lines.append(f'ytdloader_jobs_total{{state="{state}"}} {n}')
+            lines += ["# HELP ytdloader_bytes_downloaded_total Bytes transferred by finished jobs.",
+                      "# TYPE ytdloader_bytes_downloaded_total counter",
+                      f"ytdloader_bytes_downloaded_total {self._bytes['downloaded']}",
+                      "# HELP ytdloader_bytes_written_total Bytes of final output files.",
+                      "# TYPE ytdloader_bytes_written_total counter",
+                      f"ytdloader_bytes_written_total {self._bytes['written']}"]
+            if self._depths:
+                lines += ["# HELP ytdloader_queue_depth Jobs waiting or working per pipeline stage.",
+                          "# TYPE ytdloader_queue_depth gauge"]
+                for name, n in sorted(self._depths.items()):
+                    stage, state = name.rsplit("_", 1)
+                    lines.append(f'ytdloader_queue_depth{{stage="{stage}",state="{state}"}} {n}')
+            lines += _histogram_lines("ytdloader_phase_seconds", "Time spent per job phase.",
+                                      "phase", self._histograms)
+            lines += _histogram_lines("ytdloader_postprocessor_seconds", "Time spent per post-processor run.",
+                                      "postprocessor", self._pp)
+            lines += ["# HELP ytdloader_last_job_finished_timestamp_seconds When the last job finished.",
+                      "# TYPE ytdloader_last_job_finished_timestamp_seconds gauge",
+                      f"ytdloader_last_job_finished_timestamp_seconds {self._last_finished:.3f}"]
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(metric, help_text, label, table):
+    lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+    for name, h in sorted(table.items()):
+        for bound, n in zip(BUCKETS, h["buckets"]):
+            lines.append(f'{metric}_bucket{{{label}="{name}",le="{bound}"}} {n}')
+        lines.append(f'{metric}_bucket{{{label}="{name}",le="+Inf"}} {h["count"]}')
+        lines.append(f'{metric}_sum{{{label}="{name}"}} {h["sum"]:.6f}')
+        lines.append(f'{metric}_count{{{label}="{name}"}} {h["count"]}')
+    return lines
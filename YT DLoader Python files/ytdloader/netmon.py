@@ -0,0 +1,131 @@
+"""Background connectivity monitor with a cached online/offline state."""
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+DEFAULT_HOST = "www.youtube.com"
+
+
+class ConnectivityMonitor:
+    """Probes the download host on its own thread and caches the result.
+
+    ``is_online()`` never blocks: it returns the last probe result (optimistic
+    until the first probe finishes) and asks for a new probe once the result
+    is older than ``ttl``. ``on_change(online)`` is called from the monitor
+    thread on every online/offline transition.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=443, interval=30, offline_interval=5,
+                 ttl=60, timeout=3, on_change=None):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.offline_interval = offline_interval
+        self.ttl = ttl
+        self.timeout = timeout
+        self.on_change = on_change
+        self._online = None
+        self._checked_at = 0.0
+        self._next_probe = 0.0
+        self._waiters = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="ytd-netmon")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def set_target(self, url_or_host):
+        """Probe the host (and port) of ``url_or_host`` from now on.
+
+        Scheme-less URLs such as ``youtu.be/ID`` are accepted, as yt-dlp does;
+        anything without a host name probes ``DEFAULT_HOST``.
+        """
+        u = url_or_host.strip()
+        parsed = urlparse(u if "://" in u else "//" + u)
+        try:
+            host, port = parsed.hostname, parsed.port
+        except ValueError:
+            host, port = None, None
+        if not host:
+            host, port = DEFAULT_HOST, None
+        port = port or (80 if parsed.scheme == "http" else 443)
+        if (host, port) != (self.host, self.port):
+            with self._cond:
+                self.host, self.port = host, port
+                self._next_probe = 0.0
+                self._cond.notify_all()
+
+    def is_online(self):
+        with self._cond:
+            if time.monotonic() - self._checked_at > self.ttl:
+                self._next_probe = 0.0
+                self._cond.notify_all()
+            return self._online is not False
+
+    def report_failure(self):
+        """A worker hit a network error: re-probe right away."""
+        with self._cond:
+            self._next_probe = 0.0
+            self._cond.notify_all()
+
+    def when_online(self, callback, delay=0.0):
+        """Call ``callback()`` after the first successful probe at least ``delay`` seconds from now."""
+        with self._cond:
+            not_before = time.monotonic() + delay
+            self._waiters.append((not_before, callback))
+            self._next_probe = min(self._next_probe, not_before) if self._online else self._next_probe
+            self._cond.notify_all()
+
+    def probe(self):
+        try:
+            with socket.create_connection((self.host, self.port), timeout=self.timeout):
+                return True
+        except OSError:
+            return False
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    delay = self._next_probe - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if self._stopped:
+                    return
+            online = self.probe()
+            self._publish(online)
+
+    def _publish(self, online):
+        now = time.monotonic()
+        ready = []
+        with self._cond:
+            changed = self._online is not None and online != self._online
+            self._online = online
+            self._checked_at = now
+            self._next_probe = now + (self.interval if online else self.offline_interval)
+            if online:
+                ready = [cb for t, cb in self._waiters if t <= now]
+                self._waiters = [(t, cb) for t, cb in self._waiters if t > now]
+                if self._waiters:
+                    self._next_probe = min(self._next_probe, min(t for t, _ in self._waiters))
+        if changed and self.on_change:
+            try:
+                self.on_change(online)
+            except Exception:
+                pass
+        for cb in ready:
+            try:
+                cb()
+            except Exception:
+                pass
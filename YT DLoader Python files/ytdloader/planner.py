@@ -0,0 +1,58 @@
+"""Reports which formats and container each download uses, and why.
+
+Also home to ``BeforeDownloadPP``, the base of the job's ``before_dl``
+steps. Imported by ``engine.download`` in the download process, since it
+imports yt-dlp.
+"""
+from yt_dlp.postprocessor.common import PostProcessor
+
+
+def _stream(f):
+    parts = [str(f.get("format_id") or "?")]
+    vcodec, acodec = f.get("vcodec"), f.get("acodec")
+    if vcodec and vcodec != "none":
+        parts.append(vcodec.split(".")[0])
+        if f.get("height"):
+            parts.append(f"{f['height']}p")
+    if acodec and acodec != "none":
+        parts.append(acodec.split(".")[0])
+    return " ".join(parts)
+
+
+def describe_plan(info, preferences=None):
+    """One line: chosen streams, the container and why that container."""
+    formats = info.get("requested_formats") or [info]
+    ext = info.get("ext") or "?"
+    streams = " + ".join(_stream(f) for f in formats)
+    if len(formats) < 2:
+        return f"{streams} saved as .{ext} (single file, no merge)"
+    first = (preferences or [ext])[0]
+    why = "" if ext == first else f"; {first} cannot hold these codecs without re-encoding"
+    return f"{streams} merged into .{ext} by stream copy{why}"
+
+
+class BeforeDownloadPP(PostProcessor):
+    """Base of the ``before_dl`` steps of a job (``emit`` reports to it).
+
+    They run before anything is downloaded, so they report no
+    post-processing progress: that would start the post-processing phase
+    timing and the handoff too early.
+    """
+
+    def __init__(self, downloader, job_id=None, emit=None):
+        super().__init__(downloader)
+        self.job_id = job_id
+        self.emit = emit
+
+    def _hook_progress(self, status, info):
+        pass
+
+
+class PlanLogPP(BeforeDownloadPP):
+    """``before_dl`` step logging the job's format and container plan."""
+
+    def run(self, info):
+        preferences = str(self._downloader.params.get("merge_output_format") or "").split("/")
+        if self.emit:
+            self.emit("log", f"Job #{self.job_id}: {describe_plan(info, [p for p in preferences if p])}")
+        return [], info
@@ -0,0 +1,127 @@
+"""Opt-in cProfile and tracemalloc capture for fetches, downloads and the UI loop.
+
+Set ``YTDLOADER_PROFILE`` to a folder (or to ``1`` for ``profiles/`` in the
+app data folder), or pass ``--profile`` on the command line. Each profiled
+section writes ``<name>-<time>-<pid>-<n>.prof`` (open it with ``pstats`` or
+snakeviz), ``.tracemalloc`` (a ``tracemalloc.Snapshot``) and ``.alloc.txt``
+(the lines that allocated the most memory while the section ran).
+"""
+import cProfile
+import contextlib
+import itertools
+import os
+import time
+import tracemalloc
+
+ENV_VAR = "YTDLOADER_PROFILE"
+TOP_ALLOCATIONS = 40
+
+_sequence = itertools.count(1)
+
+
+def profile_dir():
+    """Folder profiles go to, or None when profiling is off."""
+    value = os.environ.get(ENV_VAR, "").strip()
+    if not value or value.lower() in ("0", "off", "false", "no"):
+        return None
+    if value.lower() in ("1", "on", "true", "yes"):
+        from . import engine
+        value = os.path.join(engine.app_data_dir(), "profiles")
+    return os.path.abspath(value)
+
+
+def enable(folder):
+    """Turn profiling on for this process and the download processes it starts."""
+    os.environ[ENV_VAR] = os.path.abspath(folder)
+    return profile_dir()
+
+
+def _start_tracing():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return tracemalloc.take_snapshot()
+
+
+def _start_profile():
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12+ allows one active profiler per process; a section that
+        # overlaps another one still gets its allocation snapshot.
+        return None
+    return profile
+
+
+class SectionProfiler:
+    """Accumulates a profile over many short calls (the UI frame callback).
+
+    Use it as a context manager around each call and ``dump`` it when done.
+    """
+
+    def __init__(self, name, folder):
+        self.name = name
+        self.folder = folder
+        self.calls = 0
+        self._profile = cProfile.Profile()
+        self._baseline = _start_tracing()
+
+    def __enter__(self):
+        try:
+            self._profile.enable()
+            self._active = True
+        except ValueError:
+            self._active = False
+        return self
+
+    def __exit__(self, *exc):
+        if self._active:
+            self._profile.disable()
+            self.calls += 1
+        return False
+
+    def dump(self):
+        return _write(self.folder, self.name, self._profile if self.calls else None, self._baseline)
+
+
+@contextlib.contextmanager
+def profiled(name, folder=None):
+    """Profile the block when profiling is on (``folder`` or ``YTDLOADER_PROFILE``)."""
+    folder = folder or profile_dir()
+    if not folder:
+        yield None
+        return
+    baseline = _start_tracing()
+    profile = _start_profile()
+    try:
+        yield profile
+    finally:
+        if profile is not None:
+            profile.disable()
+        _write(folder, name, profile, baseline)
+
+
+def _write(folder, name, profile, baseline):
+    """Write the profile and allocation snapshot; returns the file stem or None."""
+    try:
+        os.makedirs(folder, exist_ok=True)
+        # The counter keeps sections that end in the same second (one pool worker
+        # extracting a playlist) from overwriting each other.
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now % 1 * 1000):03d}"
+        stem = os.path.join(folder, f"{name}-{stamp}-{os.getpid()}-{next(_sequence)}")
+        if profile is not None:
+            profile.dump_stats(stem + ".prof")
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),))
+            snapshot.dump(stem + ".tracemalloc")
+            current, peak = tracemalloc.get_traced_memory()
+            with open(stem + ".alloc.txt", "w", encoding="utf-8") as f:
+                f.write(f"# {name}: traced {current / 1024:.0f} KiB now, peak {peak / 1024:.0f} KiB\n")
+                f.write(f"# top {TOP_ALLOCATIONS} lines by memory allocated during the section\n")
+                for stat in snapshot.compare_to(baseline, "lineno")[:TOP_ALLOCATIONS]:
+                    f.write(f"{stat}\n")
+        return stem
+    except Exception:
+        return None
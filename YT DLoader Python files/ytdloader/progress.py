@@ -0,0 +1,67 @@
+"""Coalescing of per-job progress updates between workers and a UI."""
+import threading
+import time
+
+
+class ProgressBoard:
+    """Keeps only the newest progress snapshot per job.
+
+    Workers call ``update`` as often as yt-dlp reports; the UI calls ``drain``
+    from its own loop and gets at most ``max_rate`` batches per second. Every
+    snapshot that is overwritten before being drained counts as coalesced,
+    and snapshots thrown away with ``discard`` count as dropped.
+    """
+
+    def __init__(self, max_rate=10):
+        self.max_rate = max_rate
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._last_drain = 0.0
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.delivered = 0
+
+    def update(self, job_id, snapshot):
+        """Store ``snapshot``; returns True when the board was empty before."""
+        with self._lock:
+            self.received += 1
+            was_empty = not self._latest
+            if job_id in self._latest:
+                self.coalesced += 1
+            self._latest[job_id] = snapshot
+        return was_empty
+
+    def __len__(self):
+        return len(self._latest)
+
+    def discard(self, job_id):
+        with self._lock:
+            if self._latest.pop(job_id, None) is not None:
+                self.dropped += 1
+
+    def due(self, now=None):
+        """Seconds until the next drain is allowed (0 when due now)."""
+        now = time.monotonic() if now is None else now
+        if not self.max_rate:
+            return 0.0
+        return max(0.0, self._last_drain + 1.0 / self.max_rate - now)
+
+    def drain(self, force=False):
+        """Return ``{job_id: snapshot}`` pending since the last drain, rate permitting."""
+        now = time.monotonic()
+        if not force and self.due(now) > 0:
+            return {}
+        with self._lock:
+            if not self._latest:
+                return {}
+            latest, self._latest = self._latest, {}
+            self.delivered += len(latest)
+        self._last_drain = now
+        return latest
+
+    def stats(self):
+        with self._lock:
+            return {"received": self.received, "delivered": self.delivered,
+                    "coalesced": self.coalesced, "dropped": self.dropped,
+                    "pending": len(self._latest)}
@@ -0,0 +1,160 @@
+"""Background thumbnail download, decode and caching."""
+import hashlib
+import io
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+THUMB_SIZE = (240, 135)
+
+
+class ThumbnailLoader:
+    """Fetches and downscales thumbnails on a worker thread.
+
+    ``on_ready(url, image, error)`` is called with a PIL image already sized
+    to ``size`` (or ``image=None`` and the exception). It runs on the worker
+    thread, or on the caller's thread for memory-cache hits, so GUIs should
+    pass the result to their UI queue and build the Tk image there.
+    Decoded images are kept in a small in-memory LRU; the resized JPEG bytes
+    are kept on disk, bounded by ``max_disk_bytes``.
+    """
+
+    def __init__(self, on_ready, cache_dir=None, size=THUMB_SIZE, max_items=64,
+                 max_disk_bytes=50 * 1024 * 1024, timeout=5):
+        self.on_ready = on_ready
+        self.cache_dir = cache_dir
+        self.size = tuple(size)
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self.timeout = timeout
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._in_flight = set()
+        self._session = None
+        self._disk_bytes = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+        self._thread = threading.Thread(target=self._worker_loop, daemon=True, name="ytd-thumbnails")
+        self._thread.start()
+
+    def request(self, url):
+        if not url:
+            return
+        with self._lock:
+            image = self._memory.get(url)
+            if image is not None:
+                self._memory.move_to_end(url)
+            elif url in self._in_flight:
+                return
+            else:
+                self._in_flight.add(url)
+        if image is not None:
+            self.on_ready(url, image, None)
+        else:
+            self._pending.put(url)
+
+    def _worker_loop(self):
+        while True:
+            url = self._pending.get()
+            try:
+                image = self._load(url)
+            except Exception as e:
+                self._done(url)
+                self.on_ready(url, None, e)
+                continue
+            self._remember(url, image)
+            self._done(url)
+            self.on_ready(url, image, None)
+
+    def _done(self, url):
+        with self._lock:
+            self._in_flight.discard(url)
+
+    def _remember(self, url, image):
+        with self._lock:
+            self._memory[url] = image
+            self._memory.move_to_end(url)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def _disk_path(self, url):
+        if not self.cache_dir:
+            return None
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jpg"
+        return os.path.join(self.cache_dir, name)
+
+    def _load(self, url):
+        from PIL import Image
+
+        path = self._disk_path(url)
+        if path and os.path.isfile(path):
+            try:
+                with open(path, "rb") as f:
+                    image = Image.open(io.BytesIO(f.read()))
+                    image.load()
+                os.utime(path)
+                return image
+            except Exception:
+                pass
+
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        response = self._session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        image = self.decode(response.content, self.size)
+        if path:
+            self._store(path, image)
+        return image
+
+    @staticmethod
+    def decode(data, size=THUMB_SIZE):
+        """Decode and resize image bytes; JPEGs are downscaled while decoding."""
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(data))
+        if image.format == "JPEG":
+            # Decode at 1/2, 1/4 or 1/8 scale when that still covers ``size``.
+            image.draft("RGB", size)
+        return image.convert("RGB").resize(size, Image.Resampling.LANCZOS)
+
+    def _store(self, path, image):
+        try:
+            tmp = path + ".tmp"
+            image.save(tmp, "JPEG", quality=90)
+            os.replace(tmp, path)
+            self._disk_bytes += os.path.getsize(path)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._trim_disk()
+        except Exception:
+            pass
+
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".jpg"):
+                continue
+            full = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, full))
+        return entries
+
+    def _trim_disk(self):
+        """Delete least recently used files until the cache fits again."""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, full in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(full)
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total